@@ -0,0 +1,300 @@
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import io
+import contextlib
+import numpy as np
+from lab.bytedna import ByteDNA, batched
+from lab.creature import Creature, CreatureData
+from lab.brain import PopulationBrain
+from lab.generation import Generation
+from lab.lab import Lab
+
+
+# BENCHMARK NEURON FUNCTIONS
+# Same as main.py's functions, so the benchmarks run the same kind of simulation.
+
+@batched
+def disUP(activation : np.ndarray, data : dict, generation : Generation):
+    return data["y"] / (generation.world_size - 1)
+@batched
+def disDOWN(activation : np.ndarray, data : dict, generation : Generation):
+    return (generation.world_size - 1 - data["y"]) / (generation.world_size - 1)
+@batched
+def disRIGHT(activation : np.ndarray, data : dict, generation : Generation):
+    return data["x"] / (generation.world_size - 1)
+@batched
+def disLEFT(activation : np.ndarray, data : dict, generation : Generation):
+    return (generation.world_size - 1 - data["x"]) / (generation.world_size - 1)
+
+@batched
+def moveUP(activation : np.ndarray, data : dict, generation : Generation):
+    generation.queue_moves(data["id"][activation > 0], 0, -1)
+    return np.zeros(len(activation))
+@batched
+def moveDOWN(activation : np.ndarray, data : dict, generation : Generation):
+    generation.queue_moves(data["id"][activation > 0], 0, 1)
+    return np.zeros(len(activation))
+@batched
+def moveRIGHT(activation : np.ndarray, data : dict, generation : Generation):
+    generation.queue_moves(data["id"][activation > 0], -1, 0)
+    return np.zeros(len(activation))
+@batched
+def moveLEFT(activation : np.ndarray, data : dict, generation : Generation):
+    generation.queue_moves(data["id"][activation > 0], 1, 0)
+    return np.zeros(len(activation))
+
+input_funcs = [disUP, disDOWN, disRIGHT, disLEFT]
+output_funcs = [moveUP, moveDOWN, moveRIGHT, moveLEFT]
+selection_criteria = [{"name": "x", "operator": "<", "value": 16}]
+
+# Scales: population, world_size, genome_len, steps_per_gen and generations saved in the save/load benchmarks.
+SCALES = {
+    "small": {"population": 128, "world_size": 32, "genome_len": 4, "steps_per_gen": 64, "gens": 100},
+    "medium": {"population": 1000, "world_size": 128, "genome_len": 12, "steps_per_gen": 64, "gens": 100},
+    "large": {"population": 5000, "world_size": 256, "genome_len": 24, "steps_per_gen": 64, "gens": 100}
+}
+
+
+
+# BENCHMARKS
+# Every benchmark gets the config, and returns a function that runs the timed part once. Setup isn't timed.
+
+def new_bytedna(config : dict, brain_cache_size : int = None):
+    return ByteDNA(input_funcs, output_funcs, config["genome_len"], 3, 4, 100, 5, 5, 12, brain_cache_size=brain_cache_size, seed=config["seed"])
+
+def new_generation(config : dict, bytedna : ByteDNA):
+    genomes = bytedna.random_genomes(config["population"])
+    generation = Generation(genomes, bytedna, config["world_size"], config["population"], config["steps_per_gen"], rng=np.random.default_rng(config["seed"]))
+    return generation
+
+def spawn_creatures(generation : Generation, bytedna : ByteDNA):
+    # Same as the setup of Generation.run
+    generation.map[:] = 0
+    genomes_list = bytedna.get_separated_genomes(generation.genomes)
+    generation.spawn_population(len(genomes_list))
+    brains = bytedna.compile_brains(genomes_list)
+    generation.creatures = []
+    for i, genome in enumerate(genomes_list):
+        data = CreatureData(generation, i, {"x": int(generation.x[i]), "y": int(generation.y[i])})
+        generation.creatures.append(Creature(data, genome, bytedna, generation, brains[i]))
+    return generation.creatures
+
+def bench_decode_genomes(config : dict):
+    bytedna = new_bytedna(config)
+    genomes = bytedna.random_genomes(config["population"])
+    return lambda: bytedna.decode_genomes(genomes, True)
+
+def bench_creature_init(config : dict):
+    # Brain construction of the whole population, without the compiled brain cache.
+    bytedna = new_bytedna(config, brain_cache_size=0)
+    generation = new_generation(config, bytedna)
+    return lambda: spawn_creatures(generation, bytedna)
+
+def bench_creature_update(config : dict):
+    # A single step, one Creature.update at a time
+    bytedna = new_bytedna(config)
+    generation = new_generation(config, bytedna)
+    creatures = spawn_creatures(generation, bytedna)
+    def run():
+        for creature in creatures:
+            creature.update()
+        generation.resolve_moves()
+    return run
+
+def bench_population_brain_update(config : dict):
+    # A single step, all creatures together
+    bytedna = new_bytedna(config)
+    generation = new_generation(config, bytedna)
+    brain = PopulationBrain(spawn_creatures(generation, bytedna), bytedna)
+    def run():
+        brain.update(generation)
+        generation.resolve_moves()
+    return run
+
+def bench_crossover(config : dict):
+    # Crossover of half of the population as parents (includes mutate)
+    bytedna = new_bytedna(config)
+    parents = bytedna.random_genomes(config["population"] // 2)
+    return lambda: bytedna.crossover(parents, config["population"])
+
+def bench_mutate(config : dict):
+    bytedna = new_bytedna(config)
+    genomes = bytedna.random_genomes(config["population"])
+    return lambda: bytedna.mutate(genomes)
+
+def bench_average_hamming_distance(config : dict):
+    bytedna = new_bytedna(config)
+    genomes = bytedna.random_genomes(config["population"])
+    return lambda: bytedna.average_hamming_distance(genomes, config["population"])
+
+temp_paths = [] # Temporary lab directories, removed after the benchmarks
+
+def new_temp_path():
+    path = tempfile.mkdtemp(prefix="evolutionlab_benchmark_")
+    temp_paths.append(path)
+    return path
+
+def new_lab(config : dict, path : str):
+    return Lab(new_bytedna(config), selection_criteria, config["world_size"], config["population"], config["steps_per_gen"],
+               gens_per_save=10 ** 9, checkpoint_interval=0, seed=config["seed"], name="benchmark", path=path)
+
+def bench_save_gens(config : dict):
+    # Saving config["gens"] gens into a new lab
+    path = new_temp_path()
+    bytedna = new_bytedna(config)
+    gens_genomes = bytedna.random_genomes(config["population"] * config["gens"])
+    gens_stats = [{"survived": 0, "diversity": None, "seed": 0}] * config["gens"]
+    def run():
+        shutil.rmtree(path, ignore_errors=True)
+        lab = new_lab(config, path)
+        lab.unsaved_gens_genomes = bytearray(gens_genomes)
+        lab.unsaved_gens_stats = list(gens_stats)
+        lab.save_gens()
+        lab.archive.close()
+    return run
+
+def bench_load_gens(config : dict):
+    # Loading a lab with config["gens"] saved gens, and reading all of them
+    path = new_temp_path()
+    bytedna = new_bytedna(config)
+    lab = new_lab(config, path)
+    lab.unsaved_gens_genomes = bytedna.random_genomes(config["population"] * config["gens"])
+    lab.unsaved_gens_stats = [{"survived": 0, "diversity": None, "seed": 0}] * config["gens"]
+    lab.save_gens()
+    lab.archive.close()
+    def run():
+        lab = new_lab(config, path)
+        lab.load_gens()
+        lab.archive.close()
+    return run
+
+def bench_run_generation(config : dict):
+    # A whole generation: crossover, simulation, selection and diversity
+    path = new_temp_path()
+    lab = new_lab(config, path)
+    lab.run_generation()
+    return lambda: lab.run_generation()
+
+BENCHMARKS = {
+    "decode_genomes": bench_decode_genomes,
+    "creature_init": bench_creature_init,
+    "creature_update": bench_creature_update,
+    "population_brain_update": bench_population_brain_update,
+    "crossover": bench_crossover,
+    "mutate": bench_mutate,
+    "average_hamming_distance": bench_average_hamming_distance,
+    "save_gens": bench_save_gens,
+    "load_gens": bench_load_gens,
+    "run_generation": bench_run_generation
+}
+
+
+
+# RUNNING AND COMPARING
+
+def run_benchmarks(config : dict, names : list = None, repeat : int = 5):
+    """
+    Runs the benchmarks, and returns the results as a dictionary that can be saved as a JSON baseline.
+    Every benchmark is run once as a warmup, and then timed repeat times. Times are in seconds per run.
+    """
+
+    results = {}
+    try:
+        for name in (names if names != None else BENCHMARKS.keys()):
+            # Save and load prints are hidden
+            with contextlib.redirect_stdout(io.StringIO()):
+                run = BENCHMARKS[name](config)
+                start_time = time.perf_counter()
+                run()
+                warmup_time = time.perf_counter() - start_time
+
+                # Fast benchmarks are run many times per timing, so a timing lasts at least about 0.05s.
+                number = max(1, int(0.05 / max(warmup_time, 1e-9)))
+                times = []
+                for i in range(repeat):
+                    start_time = time.perf_counter()
+                    for j in range(number):
+                        run()
+                    times.append((time.perf_counter() - start_time) / number)
+
+            results[name] = {"min": min(times), "median": float(np.median(times)), "repeat": repeat, "number": number}
+            print(f"{name:<28} min = {results[name]['min']:.6f}s  median = {results[name]['median']:.6f}s")
+    finally:
+        for path in temp_paths:
+            shutil.rmtree(path, ignore_errors=True)
+        temp_paths.clear()
+
+    return {
+        "config": config,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results
+    }
+
+def compare_results(baseline : dict, current : dict, threshold : float = 0.2):
+    """
+    Compares the current results with a baseline, and prints every benchmark's change of min time (the least noisy of the runs).
+    Returns the names of the benchmarks that are more than threshold (0.2 = 20%) slower than in the baseline.
+    """
+
+    if baseline["config"] != current["config"]:
+        print(f"\033[33mBASELINE CONFIG {baseline['config']} DOES NOT MATCH THE CURRENT CONFIG, RESULTS AREN'T COMPARABLE\033[0m")
+
+    regressions = []
+    print(f"\n{'benchmark':<28} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name:<28} {'-':>12} {result['min']:>11.6f}s {'new':>9}")
+            continue
+        baseline_min = baseline["results"][name]["min"]
+        change = result["min"] / baseline_min - 1 if baseline_min > 0 else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        color = "\033[31m" if regressed else ("\033[32m" if change < -threshold else "")
+        print(f"{color}{name:<28} {baseline_min:>11.6f}s {result['min']:>11.6f}s {change:>+8.1%}{' REGRESSION' if regressed else ''}\033[0m")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks every stage of the simulation pipeline.")
+    parser.add_argument("--scale", choices=SCALES.keys(), default="small", help="preset of population, world_size, genome_len, steps_per_gen and gens")
+    parser.add_argument("--population", type=int, help="overrides the scale's population")
+    parser.add_argument("--world-size", type=int, help="overrides the scale's world_size")
+    parser.add_argument("--genome-len", type=int, help="overrides the scale's genome_len")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS.keys(), help="runs only these benchmarks")
+    parser.add_argument("--save", metavar="FILE", help="saves the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compares the results with a JSON baseline, exits with 1 if there are regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    config = dict(SCALES[args.scale], seed=args.seed)
+    if args.population != None: config["population"] = args.population
+    if args.world_size != None: config["world_size"] = args.world_size
+    if args.genome_len != None: config["genome_len"] = args.genome_len
+    print(f"benchmark config: {config}")
+
+    current = run_benchmarks(config, args.only, args.repeat)
+
+    if args.save != None:
+        with open(args.save, "w") as file:
+            file.write(json.dumps(current, indent=4))
+        print(f"results saved into {args.save}")
+
+    if args.compare != None:
+        with open(args.compare, "r") as file:
+            baseline = json.loads(file.read())
+        regressions = compare_results(baseline, current, args.threshold)
+        if len(regressions) > 0:
+            print(f"\033[31m{len(regressions)} REGRESSIONS: {', '.join(regressions)}\033[0m")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
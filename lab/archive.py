@@ -0,0 +1,421 @@
+import os
+import json
+import mmap
+import zlib
+import lzma
+import struct
+import numpy as np
+
+class GenomeArchive:
+    # Header of an archive file: magic, version, header size, bytes per gen, population, genome_len, gene_bytes
+    HEADER_MAGIC = b"EVLGENOM"
+    HEADER_VERSION = 1
+    HEADER_FORMAT = "<8sIIQIII"
+    HEADER_SIZE = 64
+
+    def __init__(self, filepath : str, population : int, genome_len : int, gene_bytes : int):
+        """
+        Archive of every generation's genomes (genomes.bin). The file is memory-mapped, so any gen can be read without loading the whole file.
+        A new file starts with a header that has the record layout. Old files without a header are read with the given layout.
+
+        Parameters
+        ----------
+            filepath (str): Path of the archive file. It's created if it doesn't exist.
+            population (int): Genomes per gen.
+            genome_len (int): Gene count per genome.
+            gene_bytes (int): Amount of bytes that a single gene takes.
+        """
+
+        self.filepath = filepath
+        self.population = population
+        self.genome_len = genome_len
+        self.gene_bytes = gene_bytes
+        self.genome_bytes = genome_len * gene_bytes
+        self.gen_bytes = population * self.genome_bytes
+
+        self.file = None
+        self.mmap = None
+        self.mapped_size = 0
+
+        # Create a new archive with a header
+        if not os.path.isfile(filepath) or os.path.getsize(filepath) == 0:
+            with open(filepath, "wb") as file:
+                file.write(self.get_header())
+
+        # Read the header, or use the layout without a header (old archives)
+        with open(filepath, "rb") as file:
+            header = file.read(self.HEADER_SIZE)
+        if header[:len(self.HEADER_MAGIC)] == self.HEADER_MAGIC:
+            magic, version, self.header_size, gen_bytes, population, genome_len, gene_bytes = struct.unpack_from(self.HEADER_FORMAT, header)
+            if (gen_bytes, population, genome_len, gene_bytes) != (self.gen_bytes, self.population, self.genome_len, self.gene_bytes):
+                raise ValueError(f"genome archive layout (population {population}, genome_len {genome_len}, gene_bytes {gene_bytes}) doesn't match the lab")
+        else:
+            self.header_size = 0
+
+    def get_header(self):
+        header = struct.pack(self.HEADER_FORMAT, self.HEADER_MAGIC, self.HEADER_VERSION, self.HEADER_SIZE, self.gen_bytes, self.population, self.genome_len, self.gene_bytes)
+        return header.ljust(self.HEADER_SIZE, b"\0")
+
+    @property
+    def gen_count(self):
+        """Count of gens in the archive, from the file size."""
+        return (os.path.getsize(self.filepath) - self.header_size) // self.gen_bytes
+
+
+    @property
+    def file_size(self):
+        return os.path.getsize(self.filepath)
+
+    def truncate(self, gen_count : int):
+        """Cuts the archive to gen_count gens. This also removes a partly written gen after a crash."""
+        self.mmap = None
+        os.truncate(self.filepath, self.header_size + gen_count * self.gen_bytes)
+
+    def append(self, genomes : bytearray):
+        """Appends gens' genomes to the end of the archive."""
+        with open(self.filepath, "ab") as file:
+            file.write(genomes)
+
+    def get_gen(self, gen : int):
+        """Returns a gen's genomes as a read-only (population, genome bytes) numpy view into the file."""
+        gen_count = self.gen_count
+        if gen < 0:
+            gen += gen_count
+        if gen < 0 or gen >= gen_count:
+            raise IndexError(f"gen {gen} is not in the archive ({gen_count} gens)")
+        return self.get_gens(gen, gen + 1)[0]
+
+    def get_gens(self, start : int, stop : int):
+        """Returns the gens from start to stop (not included) as a read-only (gens, population, genome bytes) numpy view into the file."""
+        start = max(0, start)
+        stop = min(stop, self.gen_count)
+        count = max(0, stop - start)
+        if count == 0:
+            return np.zeros((0, self.population, self.genome_bytes), dtype=np.uint8)
+
+        # Map the file again if it has grown. Old views keep their old map.
+        file_size = os.path.getsize(self.filepath)
+        if self.mmap == None or self.mapped_size != file_size:
+            if self.file == None:
+                self.file = open(self.filepath, "rb")
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mapped_size = file_size
+
+        genomes = np.frombuffer(self.mmap, dtype=np.uint8, count=count * self.gen_bytes, offset=self.header_size + start * self.gen_bytes)
+        return genomes.reshape(count, self.population, self.genome_bytes)
+
+    def close(self):
+        self.mmap = None
+        if self.file != None:
+            self.file.close()
+            self.file = None
+
+class StatsLog:
+    # Numeric stats that are also saved into the columns file (a float64 per column and gen, None = NaN)
+    COLUMNS = ("survived", "diversity")
+
+    def __init__(self, filepath : str):
+        """
+        Append-only log of every gen's stats (stats.jsonl). Every line is a gen's stats as a JSON object,
+        so saving only writes the new gens and reading can stream the file.
+        A line without a newline at the end (an unfinished write) is ignored.
+
+        The numeric COLUMNS are also appended into a binary columns file (stats.columns), so charts can read them
+        as arrays without parsing the log.
+        """
+        self.filepath = filepath
+        self.columns_filepath = os.path.splitext(filepath)[0] + ".columns"
+        self.row_bytes = 8 * len(self.COLUMNS)
+
+    @property
+    def count(self):
+        """Count of gens in the log. Counts lines without parsing them."""
+        if not os.path.isfile(self.filepath):
+            return 0
+        count = 0
+        with open(self.filepath, "rb") as file:
+            while True:
+                chunk = file.read(1 << 20)
+                if len(chunk) == 0:
+                    break
+                count += chunk.count(b"\n")
+        return count
+
+
+    @property
+    def columns_count(self):
+        """Count of gens in the columns file."""
+        return os.path.getsize(self.columns_filepath) // self.row_bytes if os.path.isfile(self.columns_filepath) else 0
+
+    @property
+    def file_size(self):
+        return os.path.getsize(self.filepath) if os.path.isfile(self.filepath) else 0
+
+    @property
+    def columns_file_size(self):
+        return os.path.getsize(self.columns_filepath) if os.path.isfile(self.columns_filepath) else 0
+
+    def truncate(self, gen_count : int):
+        """Cuts the log to gen_count gens. This also removes a partly written line after a crash."""
+        if os.path.isfile(self.columns_filepath):
+            os.truncate(self.columns_filepath, min(self.columns_count, gen_count) * self.row_bytes)
+        if not os.path.isfile(self.filepath):
+            return
+        size = 0
+        with open(self.filepath, "rb") as file:
+            for gen, line in enumerate(file):
+                if gen >= gen_count or not line.endswith(b"\n"):
+                    break
+                size += len(line)
+        os.truncate(self.filepath, size)
+
+    def move_aside(self, suffix : str = ".old"):
+        """Renames the log and the columns file (suffix is added to their names), so the log starts empty."""
+        for filepath in (self.filepath, self.columns_filepath):
+            if os.path.isfile(filepath):
+                os.replace(filepath, filepath + suffix)
+
+    def append(self, gens_stats : list):
+        """Appends gens' stats to the end of the log and the columns file."""
+        with open(self.filepath, "a") as file:
+            file.write("".join([json.dumps(gen_stats) + "\n" for gen_stats in gens_stats]))
+        self.append_columns(gens_stats)
+
+    def append_columns(self, gens_stats : list):
+        rows = np.array([[gen_stats.get(column) if gen_stats.get(column) != None else np.nan for column in self.COLUMNS] for gen_stats in gens_stats],
+                        dtype="<f8").reshape(-1, len(self.COLUMNS))
+        with open(self.columns_filepath, "ab") as file:
+            file.write(rows.tobytes())
+
+    def sync_columns(self, count : int = None):
+        """
+        Makes the columns file match the log: gens missing from it (a save from before the columns file, or a crash between
+        the writes) are read from the log, and extra gens are cut out.
+
+        Parameters
+        ----------
+            count (int): Count of gens in the log, if it's already known. None = the log's lines are counted (reads the whole log).
+        """
+        if count == None:
+            count = self.count
+        columns_count = self.columns_count
+        if columns_count > count:
+            os.truncate(self.columns_filepath, count * self.row_bytes)
+        elif columns_count < count:
+            gens_stats = []
+            for gen_stats in self.iter_stats(columns_count):
+                gens_stats.append(gen_stats)
+                if len(gens_stats) >= 100000:
+                    self.append_columns(gens_stats)
+                    gens_stats = []
+            self.append_columns(gens_stats)
+
+    def read_columns(self, start : int = 0):
+        """Returns the numeric COLUMNS of the gens from the start gen as a dictionary of float64 arrays (None = NaN)."""
+        count = max(self.columns_count - start, 0)
+        if count > 0:
+            rows = np.fromfile(self.columns_filepath, dtype="<f8", count=count * len(self.COLUMNS), offset=start * self.row_bytes)
+        else:
+            rows = np.zeros(0, dtype="<f8")
+        rows = rows.reshape(-1, len(self.COLUMNS))
+        return {column: rows[:, i].astype(np.float64) for i, column in enumerate(self.COLUMNS)}
+
+    def iter_stats(self, start : int = 0):
+        """Yields every gen's stats from the start gen, reading one line at a time."""
+        if not os.path.isfile(self.filepath):
+            return
+        with open(self.filepath, "r") as file:
+            for gen, line in enumerate(file):
+                if gen >= start and line.endswith("\n"):
+                    yield json.loads(line)
+
+    def read(self):
+        """Returns all gens' stats as a list."""
+        return list(self.iter_stats())
+
+    def convert_json(self, json_filepath : str):
+        """
+        Converts an old stats.json (a single JSON list) into this log. This is done once, the old file is renamed to stats.json.old.
+        """
+        with open(json_filepath, "r") as file:
+            content = file.read()
+        gens_stats = json.loads(content) if content != "" else []
+
+        # Write the whole log first, so a crash can't leave a half converted save.
+        temp_filepath = self.filepath + ".tmp"
+        with open(temp_filepath, "w") as file:
+            file.write("".join([json.dumps(gen_stats) + "\n" for gen_stats in gens_stats]))
+        os.replace(temp_filepath, self.filepath)
+        os.replace(json_filepath, json_filepath + ".old")
+
+class CompressedGenomeArchive:
+    # Header of the index file: magic, version, header size, bytes per gen, population, genome_len, gene_bytes, compression
+    HEADER_MAGIC = b"EVLGZIDX"
+    HEADER_VERSION = 1
+    HEADER_FORMAT = "<8sIIQIIII"
+    HEADER_SIZE = 64
+    # Index record of a chunk: offset in the data file, compressed length, first gen, gen count
+    RECORD_FORMAT = "<QQQQ"
+    RECORD_SIZE = 32
+    COMPRESSIONS = ["zlib", "lzma"]
+
+    def __init__(self, filepath : str, population : int, genome_len : int, gene_bytes : int, compression : str = "zlib"):
+        """
+        Compressed archive of every generation's genomes, with the same interface as GenomeArchive.
+        Every append (a block of gens) is a chunk. Inside a chunk every gen is XOR-delta encoded against the previous gen,
+        so the nearly identical gens compress well. Reading a gen decompresses only its chunk.
+
+        Files
+        -----
+        - <filepath>.zbin: Compressed chunks.
+        - <filepath>.zidx: Header with the record layout + an index record per chunk.
+
+        Parameters
+        ----------
+            filepath (str): Path of the archive without an extension.
+            population (int): Genomes per gen.
+            genome_len (int): Gene count per genome.
+            gene_bytes (int): Amount of bytes that a single gene takes.
+            compression (str): "zlib" or "lzma". Used if the archive is created, an existing archive keeps its compression.
+        """
+
+        self.data_filepath = filepath + ".zbin"
+        self.index_filepath = filepath + ".zidx"
+        self.population = population
+        self.genome_len = genome_len
+        self.gene_bytes = gene_bytes
+        self.genome_bytes = genome_len * gene_bytes
+        self.gen_bytes = population * self.genome_bytes
+
+        # The last decompressed chunk (chunk index, gens), so reading gens in order decompresses every chunk once.
+        self.cached_chunk = (None, None)
+
+        # Create a new archive with a header
+        if not os.path.isfile(self.index_filepath) or os.path.getsize(self.index_filepath) < self.HEADER_SIZE:
+            if compression not in self.COMPRESSIONS:
+                raise ValueError(f"compression must be one of {self.COMPRESSIONS}, not '{compression}'")
+            header = struct.pack(self.HEADER_FORMAT, self.HEADER_MAGIC, self.HEADER_VERSION, self.HEADER_SIZE, self.gen_bytes,
+                                 self.population, self.genome_len, self.gene_bytes, self.COMPRESSIONS.index(compression))
+            with open(self.index_filepath, "wb") as file:
+                file.write(header.ljust(self.HEADER_SIZE, b"\0"))
+            open(self.data_filepath, "wb").close()
+
+        # Read the header
+        with open(self.index_filepath, "rb") as file:
+            header = file.read(self.HEADER_SIZE)
+        magic, version, header_size, gen_bytes, population, genome_len, gene_bytes, compression_i = struct.unpack_from(self.HEADER_FORMAT, header)
+        if magic != self.HEADER_MAGIC:
+            raise ValueError(f"'{self.index_filepath}' is not a compressed genome archive index")
+        if (gen_bytes, population, genome_len, gene_bytes) != (self.gen_bytes, self.population, self.genome_len, self.gene_bytes):
+            raise ValueError(f"genome archive layout (population {population}, genome_len {genome_len}, gene_bytes {gene_bytes}) doesn't match the lab")
+        self.compression = self.COMPRESSIONS[compression_i]
+        self.compressor = zlib if self.compression == "zlib" else lzma
+
+        self.load_index()
+
+    def load_index(self):
+        """Reads the chunk index into memory. A partly written record at the end is ignored."""
+        with open(self.index_filepath, "rb") as file:
+            file.seek(self.HEADER_SIZE)
+            content = file.read()
+        records_count = len(content) // self.RECORD_SIZE
+        self.index = np.frombuffer(content[:records_count * self.RECORD_SIZE], dtype="<u8").reshape(records_count, 4).astype(np.int64)
+
+    @property
+    def gen_count(self):
+        """Count of gens in the archive, from the last chunk's index record."""
+        if len(self.index) == 0:
+            return 0
+        return int(self.index[-1, 2] + self.index[-1, 3])
+
+    @property
+    def file_size(self):
+        return os.path.getsize(self.data_filepath) + os.path.getsize(self.index_filepath)
+
+
+    def truncate(self, gen_count : int):
+        """Cuts the archive to gen_count gens. This also removes partly written chunks after a crash."""
+
+        # Keep the chunks before gen_count, and the kept gens of a chunk that is cut in the middle.
+        chunk_i = int(np.searchsorted(self.index[:, 2], gen_count, side="right")) - 1 if len(self.index) > 0 else -1
+        kept_gens = None
+        if chunk_i >= 0 and gen_count < self.index[chunk_i, 2] + self.index[chunk_i, 3]:
+            kept_gens = self.read_chunk(chunk_i)[:gen_count - self.index[chunk_i, 2]]
+            chunk_i -= 1
+
+        # Cut the files after the last kept chunk
+        data_size = int(self.index[chunk_i, 0] + self.index[chunk_i, 1]) if chunk_i >= 0 else 0
+        os.truncate(self.data_filepath, data_size)
+        os.truncate(self.index_filepath, self.HEADER_SIZE + (chunk_i + 1) * self.RECORD_SIZE)
+        self.cached_chunk = (None, None)
+        self.load_index()
+
+        if kept_gens is not None and len(kept_gens) > 0:
+            self.append(kept_gens.tobytes())
+
+    def append(self, genomes : bytearray):
+        """Appends gens' genomes to the end of the archive as a single chunk."""
+        gens = np.frombuffer(genomes, dtype=np.uint8).reshape(-1, self.gen_bytes)
+        if len(gens) == 0:
+            return
+
+        # XOR-delta encode: the first gen as it is, then every gen XORed with the previous gen.
+        deltas = gens.copy()
+        deltas[1:] ^= gens[:-1]
+        compressed = self.compressor.compress(deltas.tobytes())
+
+        # Write the chunk first, then its index record. A crash between them leaves only unused bytes in the data file.
+        with open(self.data_filepath, "ab") as file:
+            offset = file.tell()
+            file.write(compressed)
+        record = struct.pack(self.RECORD_FORMAT, offset, len(compressed), self.gen_count, len(gens))
+        with open(self.index_filepath, "ab") as file:
+            file.write(record)
+        self.index = np.concatenate([self.index, np.array([[offset, len(compressed), self.gen_count, len(gens)]], dtype=np.int64)])
+
+    def read_chunk(self, chunk_i : int):
+        """Returns a chunk's gens as a (gens, gen bytes) array."""
+        if self.cached_chunk[0] == chunk_i:
+            return self.cached_chunk[1]
+
+        offset, length, first_gen, gens_count = self.index[chunk_i]
+        with open(self.data_filepath, "rb") as file:
+            file.seek(offset)
+            compressed = file.read(length)
+
+        # Undo the XOR-delta encoding
+        deltas = np.frombuffer(self.compressor.decompress(compressed), dtype=np.uint8).reshape(gens_count, self.gen_bytes)
+        gens = np.bitwise_xor.accumulate(deltas, axis=0)
+        gens.flags.writeable = False
+        self.cached_chunk = (chunk_i, gens)
+        return gens
+
+    def get_gen(self, gen : int):
+        """Returns a gen's genomes as a read-only (population, genome bytes) numpy array."""
+        gen_count = self.gen_count
+        if gen < 0:
+            gen += gen_count
+        if gen < 0 or gen >= gen_count:
+            raise IndexError(f"gen {gen} is not in the archive ({gen_count} gens)")
+        return self.get_gens(gen, gen + 1)[0]
+
+    def get_gens(self, start : int, stop : int):
+        """Returns the gens from start to stop (not included) as a (gens, population, genome bytes) numpy array."""
+        start = max(0, start)
+        stop = min(stop, self.gen_count)
+        if stop <= start:
+            return np.zeros((0, self.population, self.genome_bytes), dtype=np.uint8)
+
+        # Decompress only the chunks that have these gens
+        first_chunk = int(np.searchsorted(self.index[:, 2], start, side="right")) - 1
+        last_chunk = int(np.searchsorted(self.index[:, 2], stop - 1, side="right")) - 1
+        parts = []
+        for chunk_i in range(first_chunk, last_chunk + 1):
+            chunk_start = self.index[chunk_i, 2]
+            gens = self.read_chunk(chunk_i)
+            parts.append(gens[max(0, start - chunk_start) : stop - chunk_start])
+
+        return np.concatenate(parts).reshape(stop - start, self.population, self.genome_bytes)
+
+    def close(self):
+        self.cached_chunk = (None, None)
@@ -0,0 +1,92 @@
+import numpy as np
+from lab.bytedna import ByteDNA
+
+class PopulationBrain:
+    def __init__(self, creatures : list, bytedna : ByteDNA):
+        """
+        Packs the neuralnets of all creatures into flat arrays, so a step of every brain is a handful of array operations.
+        The results are identical to calling Creature.update for every creature.
+
+        If the bytedna has batched neuron functions, every input and output neuron is called once per step for the whole population
+        (inputs first, then outputs, in their bytedna order). Normal functions are called through a ScalarAdapter then.
+
+        Parameters
+        ----------
+            creatures (list): Creatures with their neuralnets already set up.
+            bytedna (ByteDNA): The creatures' bytedna.
+        """
+
+        self.creatures = creatures
+        self.batched = bytedna.has_batched_functions
+
+        # Every creature's neurons get a range of global neuron ids.
+        neurons_counts = np.array([len(creature.neurons_output) for creature in creatures], dtype=np.int64)
+        conns_counts = np.array([len(creature.conns_source_id) for creature in creatures], dtype=np.int64)
+        neurons_offsets = np.concatenate([[0], np.cumsum(neurons_counts)[:-1]]).astype(np.int64)
+        self.neurons_count = int(np.sum(neurons_counts))
+
+        # Neuron states
+        self.neurons_output = np.array([output for creature in creatures for output in creature.neurons_output], dtype=np.float64)
+        self.inner_neurons = np.array([func is None for creature in creatures for func in creature.neurons_function], dtype=bool)
+
+        # Custom neurons (inputs and outputs) are called per creature, in the same order as in Creature.update.
+        self.neurons_function = []
+        for creature_i, creature in enumerate(creatures):
+            offset = int(neurons_offsets[creature_i])
+            self.neurons_function.append([(offset + i, func) for i, func in enumerate(creature.neurons_function) if func is not None])
+
+        # Batched neurons. Every input and output function gets the creatures that have it, and their global neuron ids.
+        # A creature's neurons are ordered as included inputs, included inners and included outputs.
+        include_inputs = np.array([creature.include_dict["include_inputs"] for creature in creatures], dtype=bool).reshape(len(creatures), len(bytedna.inputs))
+        include_inners = np.array([creature.include_dict["include_inners"] for creature in creatures], dtype=bool).reshape(len(creatures), bytedna.inner_neurons)
+        include_outputs = np.array([creature.include_dict["include_outputs"] for creature in creatures], dtype=bool).reshape(len(creatures), len(bytedna.outputs))
+        inputs_ids = neurons_offsets[:, None] + np.cumsum(include_inputs, axis=1) - 1
+        outputs_ids = (neurons_offsets + np.sum(include_inputs, axis=1) + np.sum(include_inners, axis=1))[:, None] + np.cumsum(include_outputs, axis=1) - 1
+        self.batched_neurons = []
+        for funcs, include, ids in [(bytedna.batched_inputs, include_inputs, inputs_ids), (bytedna.batched_outputs, include_outputs, outputs_ids)]:
+            for func_i, func in enumerate(funcs):
+                creatures_ids = np.flatnonzero(include[:, func_i])
+                if len(creatures_ids) > 0:
+                    self.batched_neurons.append((func, creatures_ids, ids[creatures_ids, func_i]))
+
+        # Conns with global neuron ids
+        conns_offsets = np.repeat(neurons_offsets, conns_counts)
+        self.conns_source_id = np.array([i for creature in creatures for i in creature.conns_source_id], dtype=np.int64) + conns_offsets
+        self.conns_sink_id = np.array([i for creature in creatures for i in creature.conns_sink_id], dtype=np.int64) + conns_offsets
+        self.conns_weight = np.array([w for creature in creatures for w in creature.conns_weight], dtype=np.float64)
+
+        # Group the sink neurons by their input count. Every group is summed as a (neurons, inputs) matrix,
+        # which keeps the summing order of np.sum in Creature.update.
+        conns_order = np.argsort(self.conns_sink_id, kind="stable")
+        inputs_counts = np.bincount(self.conns_sink_id, minlength=self.neurons_count)
+        inputs_starts = np.concatenate([[0], np.cumsum(inputs_counts)[:-1]])
+        self.sink_groups = []
+        for inputs_count in np.unique(inputs_counts[inputs_counts > 0]):
+            neurons = np.flatnonzero(inputs_counts == inputs_count)
+            conns = conns_order[inputs_starts[neurons][:, None] + np.arange(inputs_count)]
+            self.sink_groups.append((neurons, conns))
+
+
+    def update(self, generation):
+        """Updates every creature's neuralnet by one step."""
+
+        # Multiply sources' outputs with conns' weights, and sum them for every sink.
+        weighted = self.conns_weight * self.neurons_output[self.conns_source_id]
+        sums = np.zeros(self.neurons_count)
+        for neurons, conns in self.sink_groups:
+            sums[neurons] = np.sum(weighted[conns], axis=1)
+
+        # Calculate activation from inputs, and update the outputs (inner neuron logic)
+        activations = np.tanh(sums)
+        self.neurons_output[self.inner_neurons] = activations[self.inner_neurons]
+
+        # (batched neuron logic)
+        if self.batched == True:
+            for func, creatures_ids, neurons in self.batched_neurons:
+                self.neurons_output[neurons] = func(activations[neurons], generation.get_batch_data(creatures_ids), generation)
+            return
+
+        # (custom neuron logic)
+        for creature, neurons_function in zip(self.creatures, self.neurons_function):
+            for neuron_i, func in neurons_function:
+                self.neurons_output[neuron_i] = func(activations[neuron_i], creature.data, generation)
@@ -1,21 +1,79 @@
 import numpy as np
-import random
 import time
+import itertools
+from collections import OrderedDict
+
+def batched(func):
+    """
+    Marks a neuron function as batched. A batched function is called once per step for all creatures that have the neuron,
+    instead of once per creature.
+
+    Batched function signature: func(activation : np.ndarray, data : dict, generation) -> np.ndarray
+    - activation: The neuron's activation of every creature in the batch.
+    - data: Population arrays of the creatures in the batch ("id", "x", "y").
+    - Returns the neuron's output of every creature in the batch.
+    """
+    func.batched = True
+    return func
+
+def is_batched(func):
+    """Returns true if the neuron function uses the batched protocol."""
+    return getattr(func, "batched", False)
+
+class ScalarAdapter:
+    def __init__(self, func):
+        """Wraps a normal neuron function func(activation, data, generation) into the batched protocol."""
+        self.func = func
+        self.batched = True
+
+    def __call__(self, activation : np.ndarray, data : dict, generation):
+        result = np.empty(len(activation))
+        for i, creature_i in enumerate(data["id"]):
+            result[i] = self.func(activation[i], generation.creatures[creature_i].data, generation)
+        return result
+
+class CompiledBrain:
+    def __init__(self, neurons_function : list, include_dict : dict, conns_source_id : list, conns_sink_id : list, conns_weight : list):
+        """
+        A genome's neuralnet that doesn't change. Creatures with the same genome share it, and get their own neuron state from new_state.
+        """
+        self.neurons_function : tuple = tuple(neurons_function)
+        self.conns_source_id : tuple = tuple(conns_source_id)
+        self.conns_sink_id : tuple = tuple(conns_sink_id)
+        self.conns_weight : tuple = tuple(conns_weight)
+
+        self.include_dict = {}
+        for key, include in include_dict.items():
+            include = np.array(include, dtype=bool)
+            include.flags.writeable = False
+            self.include_dict[key] = include
+
+    def new_state(self):
+        """Returns new neurons_inputs and neurons_output lists for a creature."""
+        neurons_inputs = [[] for i in range(len(self.neurons_function))]
+        neurons_output = [0] * len(self.neurons_function)
+        return neurons_inputs, neurons_output
 
 class ByteDNA:
+    # Max bit count of a gene field that is reranged with a lookup table
+    RERANGE_TABLE_BITS = 16
+    # Smallest size of the compiled brains cache, if its size isn't set
+    DEFAULT_BRAIN_CACHE_SIZE = 4096
+
     def __init__(self, 
                  inputs : list, outputs : list,
                  genome_len : int, gene_bytes : int, 
                  inner_neurons : int, mutation_interval : int,
                  source_id_len : int, sink_id_len : int, weight_len : int,
-                 weight_range : float = 8.0):
+                 weight_range : float = 8.0, brain_cache_size : int = None,
+                 mutation_model : str = "gene", seed : int = None):
         """
         Creates a new ByteDNA, an essential object for the lab.
 
         Parameters
         ----------
-            inputs (list): Neuron functions that result inputs.
-            outputs (list): Neuron functions that result an action.
+            inputs (list): Neuron functions that result inputs. These can be batched (see batched).
+            outputs (list): Neuron functions that result an action. These can be batched (see batched).
             genome_len (int): Gene count per genome.
             gene_bytes (int): Amount of bytes that a single gene takes.
             inner_neurons (int): Count of inner neurons.
@@ -24,6 +82,10 @@ class ByteDNA:
             sink_id_len (int): Bit count in sink_id (Part of a gene).
             weight_len (int): Bit count in weight (Part of a gene).
             weight_range (float): Total distance that weight can differ (value 8.0 = -4.0 - 4.0).
+            brain_cache_size (int): How many compiled brains are kept in memory (see compile_brain). 0 disables the cache.
+                None = at least DEFAULT_BRAIN_CACHE_SIZE, and at least the population that is compiled (see get_brain_cache_size).
+            mutation_model (str): "gene" = mutation_interval is per gene, "bit" = mutation_interval is per bit (see mutate).
+            seed (int): Seed of the random generator (rng) used in random genomes, crossover and mutations. None = random seed. A Lab reseeds rng for every gen.
         """
 
         # Setup basic properties
@@ -35,6 +97,7 @@ class ByteDNA:
         self.gene_bits = gene_bytes * 8
         self.inner_neurons = inner_neurons
         self.mutation_interval = mutation_interval
+        self.mutation_model = mutation_model
         
         self.source_id_len = source_id_len
         self.sink_id_len = sink_id_len
@@ -42,6 +105,22 @@ class ByteDNA:
 
         self.weight_range = weight_range
 
+        self.rng = np.random.default_rng(seed)
+
+        if mutation_model not in ("gene", "bit"):
+            raise ValueError(f"mutation_model must be 'gene' or 'bit', not '{mutation_model}'")
+
+        # Setup batched neuron functions. Normal functions are wrapped with an adapter.
+        self.has_batched_functions = any(is_batched(func) for func in list(inputs) + list(outputs))
+        self.batched_inputs = [func if is_batched(func) else ScalarAdapter(func) for func in inputs]
+        self.batched_outputs = [func if is_batched(func) else ScalarAdapter(func) for func in outputs]
+
+
+        # Setup compiled brains cache (least recently used are removed first)
+        self.brain_cache_size = brain_cache_size
+        self.brain_cache = OrderedDict()
+        self.brain_cache_hits = 0
+        self.brain_cache_misses = 0
 
         # Setup decode shifts
         self.source_type_shift = self.gene_bits - 1
@@ -56,9 +135,35 @@ class ByteDNA:
         self.sink_id_mask = (1 << self.sink_id_len) - 1
         self.weight_mask = (1 << self.weight_len) - 1
 
+        # Setup rerange lookup tables, indexed with [type, raw value].
+        # These hold the same values that the rerange formulas in decode_genomes give.
+        # Fields wider than RERANGE_TABLE_BITS have no table (it would be too big), they are reranged with the formulas (see rerange_columns).
+        lens = [len(self.inputs), self.inner_neurons, len(self.outputs)]
+        self.source_lens = np.array(lens[:2], dtype=np.float64) # Neuron counts by source type
+        self.sink_lens = np.array([lens[-1], lens[-2]], dtype=np.float64) # Neuron counts by sink type
+        self.source_id_table = None
+        self.sink_id_table = None
+        self.weight_table = None
+        if self.source_id_len <= self.RERANGE_TABLE_BITS:
+            source_id_steps = np.arange(2**self.source_id_len) / (2**self.source_id_len)
+            self.source_id_table = np.array([np.floor(source_id_steps * lens[source_type]) for source_type in range(2)], dtype=np.int64)
+        if self.sink_id_len <= self.RERANGE_TABLE_BITS:
+            sink_id_steps = np.arange(2**self.sink_id_len) / (2**self.sink_id_len)
+            self.sink_id_table = np.array([np.floor(sink_id_steps * lens[-1-sink_type]) for sink_type in range(2)], dtype=np.int64)
+        if self.weight_len <= self.RERANGE_TABLE_BITS:
+            self.weight_table = ((np.arange(2**self.weight_len) / (2**self.weight_len)) * self.weight_range) - (self.weight_range * 0.5)
+
     
 
 
+    def __getstate__(self):
+        """Pickles the ByteDNA without its compiled brains cache, so sending it to a worker process stays small."""
+        state = self.__dict__.copy()
+        state["brain_cache"] = OrderedDict()
+        return state
+
+
+
     # Functions that generate genomes.
 
     def random_genomes(self, amount):
@@ -66,7 +171,7 @@ class ByteDNA:
 
         # Create a list of single byte numbers, then turn that list into a bytearray.
         bytes_amount = self.gene_bytes * self.genome_len * amount
-        random_bytes = np.random.randint(0, 255, size=bytes_amount, dtype=np.uint8)
+        random_bytes = self.rng.integers(0, 255, size=bytes_amount, dtype=np.uint8)
         return bytearray(random_bytes)
 
     def identical_genomes(self, genome : bytearray, population : int):
@@ -79,81 +184,96 @@ class ByteDNA:
 
     # Functions that change the genomes.
 
-    def crossover(self, genomes : bytearray, population : int):
+    def crossover(self, genomes : bytearray, population : int, mutate : bool = True):
         """
         Between genes crossover, meaning that the inputted genomes are used as parents to create the children of the next generation.
+        The children are mutated too, unless mutate is false (then mutate can be called separately).
 
         Returns the next generation's genomes as a bytearray.
         """
-        
-        # Calculate how many genomes are in the bytearray.
-        survived = int(round(len(genomes) / self.gene_bytes / self.genome_len))
 
-        # Result variable
-        result_genomes = bytearray()
+        # View the genomes as a (survived, genome bytes) matrix, and shuffle it.
+        genome_bytes = self.genome_len * self.gene_bytes
+        parents = np.frombuffer(genomes, dtype=np.uint8).reshape(-1, genome_bytes)
+        survived = len(parents)
+        parents = parents[self.rng.permutation(survived)]
 
-
-        # Shuffle the genomes
-        separated_genomes = [genomes[i : i + (self.genome_len * self.gene_bytes)] for i in range(0, len(genomes), (self.genome_len * self.gene_bytes))]
-        random.shuffle(separated_genomes)
-
-        # If there is a single in the population, send it to the result, and pop it from the survivors.
+        # If there is a single in the population, it goes to the result as it is. The last genome is the single.
         singles = survived % 2
-        if singles == 1:
-            result_genomes.extend(separated_genomes[-1])
-            separated_genomes.pop()
 
         # Calculate parents (in couples) and needed children counts
         parents_count = survived - singles
         needed_children = population - singles
+        couples = parents_count // 2
+        if couples == 0:
+            raise ValueError(f"crossover needs at least 2 survived genomes, got {survived}")
 
         # Calculate the children amounts per couple + how many will create an additional child
         children_per_couple = (needed_children / parents_count) * 2
         default_children_per_couple = int(np.floor(children_per_couple))
         additional_childs = int(np.round((children_per_couple - default_children_per_couple) * (parents_count * 0.5)))
+        children_counts = np.full(couples, default_children_per_couple, dtype=np.int64)
+        children_counts[:additional_childs] += 1
+
+        # Children are created 2 offsprings at a time, and both offsprings of a pair share a crossover point.
+        # The second offspring of a pair is created only if the couple needs it.
+        pairs_counts = (children_counts + 1) // 2
+        pairs_offsets = np.cumsum(pairs_counts) - pairs_counts
+        crossover_points = self.rng.integers(self.genome_len, size=int(np.sum(pairs_counts)))
+
+        children_couple = np.repeat(np.arange(couples), children_counts)
+        children_rank = np.arange(len(children_couple)) - np.repeat(np.cumsum(children_counts) - children_counts, children_counts)
+        children_swapped = children_rank % 2
+        children_points = crossover_points[pairs_offsets[children_couple] + children_rank // 2]
+
+        # Every child takes the genes before the crossover point from its first parent, and the rest from its second parent.
+        first_parents = parents[children_couple * 2 + children_swapped]
+        second_parents = parents[children_couple * 2 + 1 - children_swapped]
+        from_first_parent = (np.arange(genome_bytes) // self.gene_bytes)[None, :] < children_points[:, None]
+
+        result = np.empty((singles + len(children_couple), genome_bytes), dtype=np.uint8)
+        if singles == 1:
+            result[0] = parents[-1]
+        np.copyto(result[singles:], second_parents)
+        np.copyto(result[singles:], first_parents, where=from_first_parent)
+        result_genomes = bytearray(result)
 
+        if len(result) < population:
+            print(f"dna crossover population was smaller than the needed population ({len(result)}/{population})")
 
-        # Create the children by one parent couple at a time
-        for parent_i in range(0, parents_count, 2):
-            parent0 = separated_genomes[parent_i]
-            parent1 = separated_genomes[parent_i + 1]
-            
-            # Calculate how many children this couple creates
-            children_count = default_children_per_couple
-            if additional_childs > 0:
-                children_count += 1
-                additional_childs -= 1
-            
-            # Create the children 2 offsprings at a time
-            for child_i in range(0, children_count, 2):
-                crossover_point = np.random.randint(self.genome_len)
-                result_genomes.extend(parent0[:crossover_point * self.gene_bytes])
-                result_genomes.extend(parent1[crossover_point * self.gene_bytes:])
-                if child_i + 1 < children_count: # if child_id + 1 == 3 and children_count == 3, then it only creates the first offspring
-                    result_genomes.extend(parent1[:crossover_point * self.gene_bytes])
-                    result_genomes.extend(parent0[crossover_point * self.gene_bytes:])
-            
-        
-        result_genomes_count = round(len(result_genomes) / self.genome_len / self.gene_bytes)
-        if result_genomes_count < population:
-            print(f"dna crossover population was smaller than the needed population ({result_genomes_count}/{population})")
-
-        self.mutate(result_genomes)
+        if mutate == True:
+            self.mutate(result_genomes)
         return result_genomes
     
     def mutate(self, genomes : bytearray):
-        """Mutates the genomes, does not return anything."""
-        
-        genes_in_genomes = int(len(genomes) / self.gene_bytes)
+        """
+        Mutates the genomes, does not return anything.
+        All bit flips are built into a single mask, which is applied with one XOR.
+
+        Mutation models
+        ---------------
+        - gene: Every gene mutates with a 1/mutation_interval probability. A mutation flips a random bit of a random byte in the gene.
+        - bit: Every bit flips with a 1/mutation_interval probability.
+        """
 
-        # Calculate mutation triggers, if trigger == 0, then a mutation happens.
-        mutation_triggers = np.random.randint(0, self.mutation_interval, size=genes_in_genomes)
-        for i in range(genes_in_genomes):
-            if mutation_triggers[i] == 0:
-                # Takes a random byte from gene, random bit from that, and flips it
-                byte_id = np.random.randint(0, self.gene_bytes)
-                mask = 1 << (7 - np.random.randint(0, 7))
-                genomes[i * self.gene_bytes + byte_id] ^= mask # XOR bitwise operation
+        genomes_bytes = np.frombuffer(genomes, dtype=np.uint8)
+        flip_mask = np.zeros(len(genomes_bytes), dtype=np.uint8)
+
+        if self.mutation_model == "gene":
+            # Choose the mutated genes, then a random byte from each gene, and a random bit from that byte.
+            genes_count = len(genomes_bytes) // self.gene_bytes
+            mutations = self.rng.binomial(genes_count, 1 / self.mutation_interval)
+            genes = self.rng.choice(genes_count, size=mutations, replace=False)
+            bytes_ids = genes * self.gene_bytes + self.rng.integers(self.gene_bytes, size=mutations)
+            flip_mask[bytes_ids] = 1 << self.rng.integers(8, size=mutations)
+        else:
+            # Choose the flipped bits. Many bits can be flipped in the same byte.
+            bits_count = len(genomes_bytes) * 8
+            mutations = self.rng.binomial(bits_count, 1 / self.mutation_interval)
+            bits = self.rng.choice(bits_count, size=mutations, replace=False)
+            np.bitwise_or.at(flip_mask, bits // 8, (1 << (7 - bits % 8)).astype(np.uint8))
+
+        genomes_bytes ^= flip_mask # XOR bitwise operation
 
 
 
@@ -177,45 +297,85 @@ class ByteDNA:
         - sink_id
         - weight
         """
-        
-        # Separates the genomes from the large bytearray.
-        genome_bytes_count = self.genome_len * self.gene_bytes
-        separated_genomes = [genomes[i : i + genome_bytes_count] for i in range(0, len(genomes), genome_bytes_count)]
 
-        # Decode all genes, combine them into genomes and dump the genomes into the result.
+        # Decode everything at once, then turn the columns into python lists.
+        columns = self.decode_genomes_arrays(genomes, rerange)
+        keys = list(columns.keys())
+        values = [columns[key].tolist() for key in keys]
+
+        # Combine the columns into genes and the genes into genomes.
         result = []
-        for genome in separated_genomes:
-            decoded_genome = []
-
-            # Loops through every starting point of a gene in genome.
-            for gene_start_i in range(0, genome_bytes_count, self.gene_bytes):
-                # Combine gene's bytes and turn it into an int.
-                gene = int.from_bytes(genome[gene_start_i : gene_start_i + self.gene_bytes], byteorder="big")
-                
-                # Decode with bit manipulation. This is not reranged, this is raw data.
-                decoded_gene = {
-                    "source_type":  gene    >>  self.source_type_shift  &   self.source_type_mask,
-                    "source_id":    gene    >>  self.source_id_shift    &   self.source_id_mask,
-                    "sink_type":    gene    >>  self.sink_type_shift    &   self.sink_type_mask,
-                    "sink_id":      gene    >>  self.sink_id_shift      &   self.sink_id_mask,
-                    "weight":       gene                                &   self.weight_mask
-                }
-
-                # Rerange gene
-                # id's      -> 23   -> (23 / 32) * 4 -> 2.875       -> 2 (floored)
-                # weight    -> 1483 -> [(1483 / 4096) * 8.0] - 4.0  -> -1.1
-                if rerange == True:
-                    lens = [len(self.inputs), self.inner_neurons, len(self.outputs)]
-                    decoded_gene["source_id"] = int(np.floor((decoded_gene["source_id"] / (2**self.source_id_len))  * lens[decoded_gene["source_type"]]))
-                    decoded_gene["sink_id"] =   int(np.floor((decoded_gene["sink_id"]   / (2**self.sink_id_len))    * lens[-1-decoded_gene["sink_type"]]))
-                    decoded_gene["weight"] =                ((decoded_gene["weight"]    / (2**self.weight_len))     * self.weight_range) - (self.weight_range * 0.5)
-
-                decoded_genome.append(decoded_gene)
-            
-            result.append(decoded_genome)
+        for genome_i in range(len(values[0])):
+            genome_values = [column[genome_i] for column in values]
+            result.append([dict(zip(keys, gene_values)) for gene_values in zip(*genome_values)])
 
         return result
 
+    def decode_genomes_arrays(self, genomes : bytearray, rerange : bool = False):
+        """
+        Decodes all genomes at once into numpy columns. Every column has the shape (genomes, genome_len).
+        A genome that is shorter than genome_len (like an optimized genome) is padded with zero genes, same as in decode_genomes.
+        Genes of up to 8 bytes are decoded as uint64, longer genes as python ints (slower).
+
+        Returned columns
+        ----------------
+        - source_type (uint8)
+        - source_id (int64)
+        - sink_type (uint8)
+        - sink_id (int64)
+        - weight (int64, or float64 if reranged)
+        """
+
+        # View the bytes as a (genomes, genes, gene bytes) array. The last genome is padded with zeros if it's cut short.
+        genome_bytes_count = self.genome_len * self.gene_bytes
+        genomes_bytes = np.frombuffer(genomes, dtype=np.uint8)
+        genomes_count = -(-len(genomes_bytes) // genome_bytes_count)
+        padding = genomes_count * genome_bytes_count - len(genomes_bytes)
+        if padding > 0:
+            genomes_bytes = np.concatenate([genomes_bytes, np.zeros(padding, dtype=np.uint8)])
+        genomes_bytes = genomes_bytes.reshape(genomes_count, self.genome_len, self.gene_bytes)
+
+        # Combine gene's bytes into ints (big endian). Genes longer than 8 bytes don't fit into uint64, so they are python ints (object array).
+        if self.gene_bytes <= 8:
+            genes = np.zeros((genomes_count, self.genome_len), dtype=np.uint64)
+            uint = np.uint64
+        else:
+            genes = np.zeros((genomes_count, self.genome_len), dtype=object)
+            genomes_bytes = genomes_bytes.astype(object)
+            uint = int
+        for byte_i in range(self.gene_bytes):
+            genes = (genes << uint(8)) | genomes_bytes[:, :, byte_i]
+
+        # Decode with bit manipulation. This is not reranged, this is raw data.
+        source_type = ((genes >> uint(self.source_type_shift)) & uint(self.source_type_mask)).astype(np.uint8)
+        source_id =   ((genes >> uint(self.source_id_shift))   & uint(self.source_id_mask)).astype(np.int64)
+        sink_type =   ((genes >> uint(self.sink_type_shift))   & uint(self.sink_type_mask)).astype(np.uint8)
+        sink_id =     ((genes >> uint(self.sink_id_shift))     & uint(self.sink_id_mask)).astype(np.int64)
+        weight =      (genes                                   & uint(self.weight_mask)).astype(np.int64)
+
+        # Rerange with the lookup tables, or with the formulas if a field has no table.
+        if rerange == True:
+            if self.source_id_table is not None:
+                source_id = self.source_id_table[source_type, source_id]
+            else:
+                source_id = np.floor((source_id / (2**self.source_id_len)) * self.source_lens[source_type]).astype(np.int64)
+            if self.sink_id_table is not None:
+                sink_id = self.sink_id_table[sink_type, sink_id]
+            else:
+                sink_id = np.floor((sink_id / (2**self.sink_id_len)) * self.sink_lens[sink_type]).astype(np.int64)
+            if self.weight_table is not None:
+                weight = self.weight_table[weight]
+            else:
+                weight = ((weight / (2**self.weight_len)) * self.weight_range) - (self.weight_range * 0.5)
+
+        return {
+            "source_type": source_type,
+            "source_id": source_id,
+            "sink_type": sink_type,
+            "sink_id": sink_id,
+            "weight": weight
+        }
+
     def get_separated_genomes(self, genomes : bytearray):
         return [genomes[i : i + (self.gene_bytes * self.genome_len)] for i in range(0, len(genomes), self.gene_bytes * self.genome_len)]
 
@@ -445,27 +605,172 @@ class ByteDNA:
         
         return conns_source_id, conns_sink_id, conns_weight
 
+    def compile_genes(self, source_type : list, source_id : list, sink_type : list, sink_id : list, weight : list):
+        """
+        Returns the CompiledBrain of a genome from its reranged genes (a genome's rows of decode_genomes_arrays as lists).
+        The result is the same as get_optimized_genome -> get_needed_neurons -> genome_to_conns, but the genome is decoded only once.
+        """
+
+        # Optimize: inner neurons need a valid source and a valid sink, genes that use other inner neurons are cut out (see get_optimized_genome).
+        has_source = [False] * self.inner_neurons
+        has_sink = [False] * self.inner_neurons
+        for gene_source_type, gene_source_id, gene_sink_type, gene_sink_id in zip(source_type, source_id, sink_type, sink_id):
+            if gene_sink_type == 1 and (gene_source_type == 0 or gene_source_id != gene_sink_id):
+                has_source[gene_sink_id] = True
+            if gene_source_type == 1 and (gene_sink_type == 0 or gene_sink_id != gene_source_id):
+                has_sink[gene_source_id] = True
+        genes = [gene for gene in zip(source_type, source_id, sink_type, sink_id, weight)
+                 if not (gene[0] == 1 and not (has_source[gene[1]] and has_sink[gene[1]]))
+                 and not (gene[2] == 1 and not (has_source[gene[3]] and has_sink[gene[3]]))]
+
+        # A genome without valid genes has no neurons.
+        include_inputs = [False] * len(self.inputs)
+        include_inners = [False] * self.inner_neurons
+        include_outputs = [False] * len(self.outputs)
+        if len(genes) == 0:
+            return CompiledBrain([], {"include_inputs": include_inputs, "include_outputs": include_outputs, "include_inners": include_inners}, [], [], [])
+
+        # The optimized genome is decoded with zero genes in place of the cut genes (see decode_genomes).
+        zero_gene = (0, 0, 0, 0, float(0.0 * self.weight_range - (self.weight_range * 0.5)))
+        genes.extend([zero_gene] * (self.genome_len - len(genes)))
+
+        # Include the neurons that are referenced in the genes (see get_needed_neurons)
+        for gene_source_type, gene_source_id, gene_sink_type, gene_sink_id, gene_weight in genes:
+            if gene_source_type == 1: include_inners[gene_source_id] = True
+            else: include_inputs[gene_source_id] = True
+            if gene_sink_type == 1: include_inners[gene_sink_id] = True
+            else: include_outputs[gene_sink_id] = True
+        neurons_function = [func for func, include in zip(self.inputs, include_inputs) if include == True]
+        neurons_function.extend([None] * sum(include_inners))
+        neurons_function.extend([func for func, include in zip(self.outputs, include_outputs) if include == True])
+
+        # New ids of the included neurons (see genome_to_conns)
+        input_ids = list(itertools.accumulate(include_inputs, initial=0))
+        inner_ids = list(itertools.accumulate(include_inners, initial=0))
+        output_ids = list(itertools.accumulate(include_outputs, initial=0))
+        actual_ins = input_ids[-1]
+        actual_inners = inner_ids[-1]
+
+        # Turn the genes into conns
+        conns_source_id = []
+        conns_sink_id = []
+        conns_weight = []
+        for gene_source_type, gene_source_id, gene_sink_type, gene_sink_id, gene_weight in genes:
+            if gene_source_type == 0: conns_source_id.append(input_ids[gene_source_id])
+            else: conns_source_id.append(actual_ins + inner_ids[gene_source_id])
+            if gene_sink_type == 0: conns_sink_id.append(actual_ins + actual_inners + output_ids[gene_sink_id])
+            else: conns_sink_id.append(actual_ins + inner_ids[gene_sink_id])
+            conns_weight.append(gene_weight)
+
+        return CompiledBrain(neurons_function, {"include_inputs": include_inputs, "include_outputs": include_outputs, "include_inners": include_inners},
+                             conns_source_id, conns_sink_id, conns_weight)
+
+    def compile_brains(self, genomes_list : list):
+        """
+        Returns the CompiledBrain of every genome in the list (see compile_brain). Only the genomes that aren't in the cache
+        are decoded, together with a single decode_genomes_arrays call, and identical genomes are compiled once.
+        Every genome but the last must have genome_len genes.
+        """
+
+        # Use the cached brains, and collect the positions of every missing genome
+        brains = [None] * len(genomes_list)
+        missing = {} # Genome bytes -> positions in the list
+        for i, genome in enumerate(genomes_list):
+            key = bytes(genome)
+            brain = self.brain_cache.get(key)
+            if brain != None:
+                self.brain_cache.move_to_end(key)
+                self.brain_cache_hits += 1
+                brains[i] = brain
+            else:
+                missing.setdefault(key, []).append(i)
+        if len(missing) == 0:
+            return brains
+
+        # Decode the missing genomes at once, and compile every one of them
+        keys = list(missing.keys())
+        columns = self.decode_genomes_arrays(b"".join(keys), True)
+        genes = [columns[name].tolist() for name in ("source_type", "source_id", "sink_type", "sink_id", "weight")]
+        cache_size = self.get_brain_cache_size(len(genomes_list))
+        for row, key in enumerate(keys):
+            brain = self.compile_genes(*[column[row] for column in genes])
+            for i in missing[key]:
+                brains[i] = brain
+            self.brain_cache_misses += 1
+            self.brain_cache_hits += len(missing[key]) - 1
+
+            # Cache the brain, and remove the least recently used brain if the cache is full
+            if cache_size > 0:
+                self.brain_cache[key] = brain
+                if len(self.brain_cache) > cache_size:
+                    self.brain_cache.popitem(last=False)
+
+        return brains
+
+    def get_brain_cache_size(self, population : int):
+        """
+        Returns how many compiled brains the cache keeps, when a population of this size is compiled.
+        A population is compiled in order, so a cache smaller than the population would miss every genome of the next gen too.
+        """
+        if self.brain_cache_size == None:
+            return max(self.DEFAULT_BRAIN_CACHE_SIZE, population)
+        return self.brain_cache_size
+
+    def compile_brain(self, genome : bytearray):
+        """
+        Returns the genome's CompiledBrain (optimized genome -> needed neurons -> conns).
+        Compiled brains are cached by the genome bytes, so identical genomes are compiled only once.
+        """
+        if len(genome) == 0:
+            return self.compile_genes([], [], [], [], [])
+        return self.compile_brains([genome])[0]
+
     def average_hamming_distance(self, genomes : bytearray, population : int):
         """
         Calculates the average hamming distance between the genomes.
         This can be used to see how different dna the creatures have.
+
+        This is exact and doesn't compare genomes with each other. If k of N genomes have a bit set,
+        that bit is different in k * (N - k) of the genome pairs.
         """
 
         genome_bytes = self.gene_bytes * self.genome_len
         genome_bits = self.gene_bits * self.genome_len
+        genomes_matrix = np.frombuffer(genomes, dtype=np.uint8)[:population * genome_bytes].reshape(-1, genome_bytes)
+        population = len(genomes_matrix)
+        if population < 2:
+            return 0.0
 
-        diverse_bits = 0 # how many bits were different in all comparisons
-        comparisons = 0 # comparisons count
+        # Count the set bits of every bit column (in chunks, so the unpacked bits stay small)
+        ones = np.zeros(genome_bits, dtype=np.int64)
+        for i in range(0, population, 4096):
+            ones += np.sum(np.unpackbits(genomes_matrix[i : i + 4096], axis=1), axis=0, dtype=np.int64)
 
-        # Combines genome's genes into large integers. Every genome is represented as an int.
-        int_genomes = [int.from_bytes(genomes[i * genome_bytes : i * genome_bytes + genome_bytes]) for i in range(population)]
+        diverse_bits = int(np.sum(ones * (population - ones))) # how many bits were different in all comparisons
+        comparisons = population * (population - 1) // 2 # comparisons count
 
-        # Does all comparisons. Every genome is compared to every genome but not itself.
-        for i in range(0, population - 1):
-            for j in range(1, population):
-                diverse_bits += (int_genomes[i] ^ int_genomes[j]).bit_count()
-                comparisons += 1
-        
         result = diverse_bits / comparisons / genome_bits * 2
         return result
 
+    def sampled_hamming_distance(self, genomes : bytearray, population : int, samples : int):
+        """
+        Estimates the average hamming distance between the genomes from random genome pairs.
+        Costs O(samples) instead of O(population).
+        """
+
+        genome_bytes = self.gene_bytes * self.genome_len
+        genome_bits = self.gene_bits * self.genome_len
+        genomes_matrix = np.frombuffer(genomes, dtype=np.uint8)[:population * genome_bytes].reshape(-1, genome_bytes)
+        population = len(genomes_matrix)
+        if population < 2:
+            return 0.0
+
+        # Random pairs of different genomes
+        first = self.rng.integers(population, size=samples)
+        second = self.rng.integers(population - 1, size=samples)
+        second += second >= first
+
+        diverse_bits = np.sum(np.unpackbits(genomes_matrix[first] ^ genomes_matrix[second], axis=1))
+
+        result = diverse_bits / samples / genome_bits * 2
+        return float(result)
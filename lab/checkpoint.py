@@ -0,0 +1,70 @@
+import os
+import json
+import struct
+
+# CHECKPOINT FILE
+# Header: magic, version, length of the JSON header. The JSON header has the checkpoint's fields, and the lengths of the bytes fields,
+# which are written after it as raw bytes (in the same order). Nothing in the file is executed when it's loaded (no pickle),
+# so opening a shared save is safe.
+CHECKPOINT_MAGIC = b"EVLCKPT\0"
+CHECKPOINT_VERSION = 2
+CHECKPOINT_HEADER_FORMAT = "<8sIQ"
+
+def save_checkpoint(filepath : str, checkpoint : dict):
+    """
+    Writes a checkpoint atomically. It's written into a temporary file first, which then replaces the old checkpoint,
+    so a crash can't leave a half written checkpoint.
+
+    Parameters
+    ----------
+        checkpoint (dict): Fields of the checkpoint. Values are bytes (or bytearray), or anything that JSON can write (lists come back as lists).
+    """
+    fields = {}
+    sections = []
+    for name, value in checkpoint.items():
+        if isinstance(value, (bytes, bytearray)):
+            sections.append((name, bytes(value)))
+        else:
+            fields[name] = value
+    header = json.dumps({"fields": fields, "sections": [[name, len(value)] for name, value in sections]}).encode("utf-8")
+
+    temp_filepath = filepath + ".tmp"
+    with open(temp_filepath, "wb") as file:
+        file.write(struct.pack(CHECKPOINT_HEADER_FORMAT, CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(header)))
+        file.write(header)
+        for name, value in sections:
+            file.write(value)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filepath, filepath)
+
+def load_checkpoint(filepath : str):
+    """
+    Returns the checkpoint as a dictionary, or None if there is no checkpoint, it's from a different version
+    (older checkpoints were pickled, they are never loaded) or it's not a valid checkpoint.
+    """
+    if not os.path.isfile(filepath):
+        return None
+    with open(filepath, "rb") as file:
+        content = file.read()
+
+    header_size = struct.calcsize(CHECKPOINT_HEADER_FORMAT)
+    if len(content) < header_size:
+        return None
+    magic, version, header_len = struct.unpack_from(CHECKPOINT_HEADER_FORMAT, content)
+    if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+        return None
+    try:
+        header = json.loads(content[header_size:header_size + header_len].decode("utf-8"))
+    except ValueError:
+        return None
+
+    # Read the bytes fields after the JSON header
+    checkpoint = header["fields"]
+    offset = header_size + header_len
+    for name, length in header["sections"]:
+        if offset + length > len(content):
+            return None
+        checkpoint[name] = content[offset:offset + length]
+        offset += length
+    return checkpoint
@@ -1,22 +1,65 @@
 import numpy as np
-from lab.bytedna import ByteDNA
+from collections.abc import MutableMapping
+from lab.bytedna import ByteDNA, CompiledBrain, is_batched
+
+class CreatureData(MutableMapping):
+    def __init__(self, generation, index : int, data : dict = None):
+        """
+        Creature's data dictionary. The position ("x" and "y") is stored in the generation's population arrays,
+        so batched neuron functions and the creature see the same position. Other keys are stored normally.
+        """
+        self.generation = generation
+        self.index : int = index
+        self.other = {}
+        if data != None:
+            for key, value in data.items():
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key == "x": return int(self.generation.x[self.index])
+        if key == "y": return int(self.generation.y[self.index])
+        return self.other[key]
+
+    def __setitem__(self, key, value):
+        if key == "x": self.generation.x[self.index] = value
+        elif key == "y": self.generation.y[self.index] = value
+        else: self.other[key] = value
+
+    def __delitem__(self, key):
+        if key == "x" or key == "y":
+            raise KeyError(f"creature's position key '{key}' can't be deleted")
+        del self.other[key]
+
+    def __iter__(self):
+        yield "x"
+        yield "y"
+        yield from self.other
+
+    def __len__(self):
+        return 2 + len(self.other)
+
+    def __repr__(self):
+        return repr(dict(self))
 
 class Creature:
-    def __init__(self, data : dict, genome : bytearray, bytedna : ByteDNA, generation):
+    def __init__(self, data : CreatureData, genome : bytearray, bytedna : ByteDNA, generation, brain : CompiledBrain = None):
         # Setup Creature's variables
-        self.data : dict = data
+        self.data : CreatureData = data
         self.genome : bytearray = genome
         self.bytedna : ByteDNA = bytedna
         self.generation = generation
 
-        # Add creature to this point in the map
-        generation.map[data["x"]][data["y"]] = 1
+        # Add creature (index + 1) to this point in the map
+        generation.map[data["x"]][data["y"]] = data.index + 1
+
+        # Setup neuralnet. The compiled brain is shared, the neuron state is creature's own. (A brain compiled with the population can be given)
+        if brain == None:
+            brain = self.bytedna.compile_brain(genome)
+        self.neurons_function = brain.neurons_function
+        self.include_dict = brain.include_dict
+        self.conns_source_id, self.conns_sink_id, self.conns_weight = brain.conns_source_id, brain.conns_sink_id, brain.conns_weight
+        self.neurons_inputs, self.neurons_output = brain.new_state()
 
-        # Setup neuralnet
-        optimized_genome = self.bytedna.get_optimized_genome(genome)
-        self.neurons_inputs, self.neurons_output, self.neurons_function, include_dict = self.bytedna.get_needed_neurons(optimized_genome)
-        self.conns_source_id, self.conns_sink_id, self.conns_weight = self.bytedna.genome_to_conns(optimized_genome, include_dict)
-        
 
     def update(self):
         # Clear inputs
@@ -42,6 +85,11 @@ class Creature:
             if func == None:
                 self.neurons_output[i] = activations[i]
 
+            # (batched neuron logic, as a batch of this creature only)
+            elif is_batched(func):
+                batch_data = self.generation.get_batch_data(np.array([self.data.index]))
+                self.neurons_output[i] = func(activations[i : i + 1], batch_data, self.generation)[0]
+
             # (custom neuron logic)
-            else: 
+            else:
                 self.neurons_output[i] = func(activations[i], self.data, self.generation)
@@ -0,0 +1,237 @@
+import os
+import zlib
+import struct
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from lab.generation import Generation
+from lab.lab import Lab
+from lab.recording import StepRecording
+
+# Colors of the exported images: empty, creature, border (like view_generation).
+PALETTE = [(0, 0, 0), (0, 255, 0), (255, 255, 255), (0, 0, 0)]
+
+def render_frame(step_map : np.ndarray, cell_size : int = 4, border : int = 1):
+    """
+    Renders a step's map into an image of palette indexes (see PALETTE), without a display.
+
+    Parameters
+    ----------
+        step_map (np.ndarray): Map of the step, map[x][y] != 0 = creature.
+        cell_size (int): Size of a cell in pixels.
+        border (int): Width of the white border around the map in pixels.
+
+    Returns
+    -------
+        image (np.ndarray): (height, width) uint8 array.
+    """
+
+    # Map is indexed [x][y], so rows of the image are its columns.
+    cells = (np.asarray(step_map).T != 0).astype(np.uint8)
+    image = np.repeat(np.repeat(cells, cell_size, axis=0), cell_size, axis=1)
+    if border > 0:
+        image = np.pad(image, border, constant_values=2)
+    return image
+
+def lzw_encode(pixels : bytes, min_code_size : int):
+    """Compresses palette indexes with GIF's variable length LZW, and returns the codes packed into bytes."""
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+
+    output = bytearray()
+    bit_buffer = 0
+    bit_count = 0
+
+    # Codes of the strings are found by (prefix code, next pixel)
+    table = {}
+    next_code = end_code + 1
+    code_size = min_code_size + 1
+
+    def write_code(code : int, size : int):
+        nonlocal bit_buffer, bit_count
+        bit_buffer |= code << bit_count
+        bit_count += size
+        while bit_count >= 8:
+            output.append(bit_buffer & 0xFF)
+            bit_buffer >>= 8
+            bit_count -= 8
+
+    write_code(clear_code, code_size)
+    prefix = pixels[0]
+    for pixel in pixels[1:]:
+        key = (prefix << 8) | pixel
+        code = table.get(key)
+        if code != None:
+            prefix = code
+            continue
+
+        write_code(prefix, code_size)
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > (1 << code_size) and code_size < 12:
+                code_size += 1
+        else:
+            # Table is full, start a new one.
+            write_code(clear_code, code_size)
+            table = {}
+            next_code = end_code + 1
+            code_size = min_code_size + 1
+        prefix = pixel
+
+    write_code(prefix, code_size)
+    write_code(end_code, code_size)
+    if bit_count > 0:
+        output.append(bit_buffer & 0xFF)
+    return bytes(output)
+
+def write_gif(filepath : str, images, fps : float = 10):
+    """
+    Writes images (palette indexes, see render_frame) as a looping animated GIF.
+    After the first image, only the area that changed from the previous image is written.
+    """
+
+    images = iter(images)
+    first_image = next(images)
+    height, width = first_image.shape
+    delay = max(1, round(100 / fps)) # In 1/100 seconds
+
+    with open(filepath, "wb") as file:
+        # Header, screen descriptor (global palette of 4 colors) and the palette
+        file.write(b"GIF89a")
+        file.write(struct.pack("<HHBBB", width, height, 0xF1, 0, 0))
+        file.write(bytes([channel for color in PALETTE for channel in color]))
+
+        # Loop forever
+        file.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+        previous_image = None
+        for image in itertools.chain([first_image], images):
+            # Crop to the changed area (a single pixel if nothing changed).
+            if previous_image is None:
+                top, left, bottom, right = 0, 0, height, width
+            else:
+                changed = np.argwhere(image != previous_image)
+                if len(changed) == 0:
+                    top, left, bottom, right = 0, 0, 1, 1
+                else:
+                    (top, left), (bottom, right) = changed.min(axis=0), changed.max(axis=0) + 1
+            previous_image = image
+
+            # Graphic control (delay, keep the previous image under this one) and the image descriptor
+            file.write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 0x04, delay, 0, 0))
+            file.write(struct.pack("<BHHHHB", 0x2C, left, top, right - left, bottom - top, 0))
+
+            # Image data in blocks of 255 bytes
+            data = lzw_encode(np.ascontiguousarray(image[top:bottom, left:right]).tobytes(), 2)
+            file.write(b"\x02")
+            for i in range(0, len(data), 255):
+                block = data[i:i + 255]
+                file.write(bytes([len(block)]) + block)
+            file.write(b"\x00")
+
+        file.write(b"\x3B")
+
+def write_png(filepath : str, image : np.ndarray):
+    """Writes an image (palette indexes, see render_frame) as a PNG."""
+    height, width = image.shape
+
+    def chunk(chunk_type : bytes, data : bytes):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    # Every row starts with filter type 0 (none)
+    rows = np.zeros(shape=(height, width + 1), dtype=np.uint8)
+    rows[:, 1:] = image
+    with open(filepath, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)))
+        file.write(chunk(b"PLTE", bytes([channel for color in PALETTE for channel in color])))
+        file.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        file.write(chunk(b"IEND", b""))
+
+def export_steps(steps_data, filepath : str, format : str = "gif", fps : float = 10, cell_size : int = 4):
+    """
+    Exports a generation's steps as an animated GIF (filepath), or as PNG frames (filepath is a directory, frames are step_<step>.png).
+
+    Parameters
+    ----------
+        steps_data (StepRecording): Recorded steps of the generation. A list of {"map": map} steps works too.
+        format (str): "gif" or "png".
+        fps (float): Frames per second of the GIF.
+        cell_size (int): Size of a cell in pixels.
+    """
+
+    images = (render_frame(steps_data[step]["map"], cell_size) for step in range(len(steps_data)))
+    if format == "gif":
+        write_gif(filepath, images, fps)
+    elif format == "png":
+        os.makedirs(filepath, exist_ok=True)
+        for step, image in enumerate(images):
+            write_png(os.path.join(filepath, f"step_{step}.png"), image)
+    else:
+        raise ValueError(f"format must be 'gif' or 'png', not '{format}'")
+
+def export_worker(task : dict):
+    """Exports a single gen in a worker process, from its recording or by replaying it. Returns the output's path."""
+    if task["recording"] != None:
+        steps_data = StepRecording.open(*task["recording"])
+    else:
+        genomes, bytedna, gen_seed, settings = task["replay"]
+        dna_rng, generation_rng = Lab.get_gen_rngs(gen_seed)
+        generation = Generation(genomes, bytedna, rng=generation_rng, **settings)
+        generation.run(save_steps=True)
+        steps_data = generation.steps_data
+
+    export_steps(steps_data, task["filepath"], task["format"], task["fps"], task["cell_size"])
+    return task["filepath"]
+
+def export_generations(lab, gens : list, path : str = None, format : str = "gif", fps : float = 10, cell_size : int = 4,
+                       processes : int = os.cpu_count()):
+    """
+    Exports gens headlessly in parallel worker processes. Recorded gens (see Lab's record_gens) are read from their recordings,
+    other gens are replayed from their genomes and seeds (see Lab.replay_generation).
+    The workers import the neuron functions' module again with the spawn start method (Windows, macOS), so a script
+    that exports must run its lab only under if __name__ == "__main__" (like main.py).
+
+    Parameters
+    ----------
+        lab (Lab): Lab of the gens.
+        gens (list): Gens to export.
+        path (str): Directory of the exports (gen_<gen>.gif, or gen_<gen> directories of PNG frames). None = saves/<lab>/exports.
+        format (str): "gif" or "png".
+        fps (float): Frames per second of the GIFs.
+        cell_size (int): Size of a cell in pixels.
+        processes (int): Count of worker processes.
+
+    Returns
+    -------
+        filepaths (list): Paths of the exports in the gens' order.
+    """
+
+    if format not in ("gif", "png"):
+        raise ValueError(f"format must be 'gif' or 'png', not '{format}'")
+    if path == None:
+        path = os.path.join(lab.path, "exports")
+    os.makedirs(path, exist_ok=True)
+
+    settings = {"world_size": lab.world_size, "population": lab.population, "steps_per_gen": lab.steps_per_gen, "move_order": lab.move_order,
+                "spawn_region": lab.spawn_region, "spawn_density": lab.spawn_density}
+    tasks = []
+    for gen in gens:
+        task = {
+            "filepath": os.path.join(path, f"gen_{gen}.gif" if format == "gif" else f"gen_{gen}"),
+            "format": format,
+            "fps": fps,
+            "cell_size": cell_size,
+            "recording": None,
+            "replay": None
+        }
+        if gen in lab.recorder.index:
+            task["recording"] = (lab.recorder.get_filepath(gen), lab.recorder.index[gen]["world_size"])
+        else:
+            # Only what the replay needs. The bytedna is pickled without its brains cache (see ByteDNA.__getstate__).
+            task["replay"] = (bytes(lab.load_gen(gen)), lab.bytedna, lab.get_replay_seed(gen), settings)
+        tasks.append(task)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(export_worker, tasks))
@@ -1,102 +1,208 @@
 import numpy as np
-import copy
-import time
 from lab.bytedna import ByteDNA
-from lab.creature import Creature
+from lab.creature import Creature, CreatureData
+from lab.brain import PopulationBrain
+from lab.recording import StepRecording
+from lab.profiling import PhaseTimer
+from lab.selection import Selection
 
 class Generation:
-    def __init__(self, genomes, bytedna : ByteDNA, world_size : int, population : int, steps_per_gen : int):
+    def __init__(self, genomes, bytedna : ByteDNA, world_size : int, population : int, steps_per_gen : int, move_order : str = "sequential",
+                 rng : np.random.Generator = None, spawn_region : tuple = None, spawn_density : float = 1.0):
+        """
+        Parameters
+        ----------
+            move_order (str): How the queued moves of a step are resolved (see resolve_moves). "sequential" or "bulk".
+            rng (np.random.Generator): Random generator of the generation (spawn positions). None = random seed.
+            spawn_region (tuple): Rectangle (x_min, y_min, x_max, y_max) where creatures spawn, max values excluded. None = the whole map.
+            spawn_density (float): Max share of the spawn region's cells that the creatures may fill (1.0 = every cell).
+        """
+
         # Setup Generation's variables
         self.genomes : list = genomes
         self.bytedna : ByteDNA = bytedna
         self.world_size : int = world_size
         self.population : int = population
         self.steps_per_gen : int = steps_per_gen
-        self.map = np.zeros(shape=(world_size, world_size), dtype=np.int8)
+        self.move_order : str = move_order
+        self.rng : np.random.Generator = rng if rng != None else np.random.default_rng()
+        self.map = np.zeros(shape=(world_size, world_size), dtype=np.int32) # Creature index + 1 in every occupied cell, 0 = empty.
+        self.occupancy_sat = None # Summed-area table of the occupied cells, built once per step when a sensor needs it (see get_occupancy_sat).
+
+        if move_order not in ("sequential", "bulk"):
+            raise ValueError(f"move_order must be 'sequential' or 'bulk', not '{move_order}'")
+
+        self.spawn_region : tuple = tuple(spawn_region) if spawn_region != None else (0, 0, world_size, world_size)
+        self.spawn_density : float = spawn_density
+        x_min, y_min, x_max, y_max = self.spawn_region
+        if not (0 <= x_min < x_max <= world_size and 0 <= y_min < y_max <= world_size):
+            raise ValueError(f"spawn_region {self.spawn_region} must be a non-empty rectangle inside the {world_size}x{world_size} map")
+        if not (0 < spawn_density <= 1):
+            raise ValueError(f"spawn_density must be between 0 and 1, not {spawn_density}")
+
+        # Population arrays. Creatures' data reads and writes the position from these.
+        # Heading is the direction of a creature's latest queued move (0, 0 = hasn't moved).
+        self.x = np.zeros(0, dtype=np.int64)
+        self.y = np.zeros(0, dtype=np.int64)
+        self.heading_x = np.zeros(0, dtype=np.int64)
+        self.heading_y = np.zeros(0, dtype=np.int64)
+
+        # Moves queued during a step. Every queue_moves call is one round: (creatures ids, x changes, y changes).
+        self.moves_queue = []
 
         self.steps_data = []
         
     
-    def run(self, save_steps : bool = False, debug : bool = False):
-        start_time = time.time()
+    def run(self, save_steps : bool = False, debug : bool = False, population_brain : bool = True, recording : StepRecording = None,
+            timer : PhaseTimer = None):
+        """
+        Runs the generation through all of its steps.
 
-        # Create the creatures
-        self.creatures = []
+        Parameters
+        ----------
+            save_steps (bool): Records creatures' positions after every step into steps_data (StepRecording).
+            debug (bool): Prints the phases' times.
+            population_brain (bool): Updates all creatures' neuralnets together as a PopulationBrain, instead of one Creature.update at a time. Both give identical results.
+            recording (StepRecording): Records the steps into this recording (like a file from StepRecorder) instead of a new one in memory. Implies save_steps.
+            timer (PhaseTimer): Measures the phases (spawn, brain_compile, stepping) into this timer. None = a new timer (self.timer).
+        """
+
+        self.timer = timer if timer != None else PhaseTimer()
         genomes_list = self.bytedna.get_separated_genomes(self.genomes)
-        for genome in genomes_list:
-            x, y = self.get_empty_pos()
-            data = {
-                "x": x,
-                "y": y
-            }
-            self.creatures.append(Creature(data, genome, self.bytedna, self))
-        
-        setup_time = time.time() - start_time
-        start_time = time.time()
 
-        # Run through the steps
-        for step in range(self.steps_per_gen):
-            for creature in self.creatures:
-                creature.update()
+        # Spawn the creatures into empty positions
+        with self.timer.phase("spawn"):
+            self.spawn_population(len(genomes_list))
+        self.timer.counters["creatures"] = len(genomes_list)
+
+        # Create the creatures and their brains
+        with self.timer.phase("brain_compile"):
+            # The whole population is decoded at once (see ByteDNA.compile_brains).
+            brains = self.bytedna.compile_brains(genomes_list)
+            self.creatures = []
+            for i, genome in enumerate(genomes_list):
+                data = CreatureData(self, i, {
+                    "x": int(self.x[i]),
+                    "y": int(self.y[i])
+                })
+                self.creatures.append(Creature(data, genome, self.bytedna, self, brains[i]))
             
-            if save_steps == True:
-                self.steps_data.append({"map": copy.deepcopy(self.map)})
+            if population_brain == True:
+                brain = PopulationBrain(self.creatures, self.bytedna)
+
+        if recording != None:
+            save_steps = True
+            self.steps_data = recording
+        elif save_steps == True:
+            self.steps_data = StepRecording(self.world_size, len(self.creatures), self.steps_per_gen)
+
+        # Run through the steps
+        with self.timer.phase("stepping"):
+            for step in range(self.steps_per_gen):
+                if population_brain == True:
+                    brain.update(self)
+                else:
+                    for creature in self.creatures:
+                        creature.update()
+                self.resolve_moves()
+                
+                if save_steps == True:
+                    self.steps_data.record(self.x, self.y)
         
         # Debug time (if enabled)
-        steps_time = time.time() - start_time
         if debug == True:
-            print(f"GEN DEBUG -> setup_time = {round(setup_time, 6)}, steps_time = {round(steps_time, 6)}")
+            print(f"GEN DEBUG -> {', '.join([f'{name}_time = {round(seconds, 6)}' for name, seconds in self.timer.phases.items()])}")
             
 
-    def get_selection_genomes(self, selection_criteria : list):
-        result_genomes = bytearray()
-        
-        # Loop through all creatures and adds the creatures that match the criteria to the result list.
-        for creature in self.creatures:
-            data = creature.data
-            survives = True
-
-            # Put all names from criteria into a list.
-            criteria_names = []
-            for criterion in selection_criteria:
-                if not criterion["name"] in criteria_names: criteria_names.append(criterion["name"])
-
-            for name in criteria_names:
-                matches_criterion = True
-                name_criteria = [criterion for criterion in selection_criteria if criterion["name"] == name]
-                for criterion in name_criteria:
-                    operator = criterion["operator"]
-                    value = criterion["value"]
-
-                    # Check if creature survives by the operator that is being used
-                    if operator == "=":
-                        if data[name] != value: matches_criterion = False
-                    elif operator == "<":
-                        if data[name] >= value: matches_criterion = False
-                    elif operator == ">":
-                        if data[name] <= value: matches_criterion = False
-
-                survives = matches_criterion
-                if survives == False: break
-            
-            # Creature's genome is added to the result, IF it survives.
-            if survives == True:
-                result_genomes.extend(creature.genome)
-        
-        return result_genomes
+    def get_selection_indices(self, selection):
+        """
+        Returns the indices of the creatures that survive the selection, in order.
+
+        Parameters
+        ----------
+            selection (Selection): Compiled selection criteria (see lab.selection). A list of criteria works too, it's compiled every call.
+        """
+        if not isinstance(selection, Selection):
+            selection = Selection(selection)
+        return selection.get_indices(self)
+
+    def get_selection_genomes(self, selection):
+        """Returns the genomes of the creatures that survive the selection (see get_selection_indices), gathered from the genomes at once."""
+        indices = self.get_selection_indices(selection)
+        genome_bytes = self.bytedna.genome_len * self.bytedna.gene_bytes
+        genomes_matrix = np.frombuffer(self.genomes, dtype=np.uint8)[:len(self.x) * genome_bytes].reshape(-1, genome_bytes)
+        return bytearray(genomes_matrix[indices].tobytes())
+
+
+    def get_batch_data(self, ids : np.ndarray):
+        """Returns the data of the creatures with these ids as population arrays. This is the data that batched neuron functions get."""
+        return {
+            "id": ids,
+            "x": self.x[ids],
+            "y": self.y[ids]
+        }
 
+    def spawn_positions(self, count : int):
+        """
+        Chooses empty positions for count creatures at once: a random choice without replacement from the spawn region's empty cells.
+        Raises a ValueError if the creatures don't fit into the region (see spawn_region and spawn_density).
 
+        Returns
+        -------
+            x (np.ndarray): X positions (int64).
+            y (np.ndarray): Y positions (int64).
+        """
+
+        x_min, y_min, x_max, y_max = self.spawn_region
+        region = self.map[x_min:x_max, y_min:y_max]
+        empty_cells = np.flatnonzero(region == 0)
+        capacity = int(region.size * self.spawn_density) - (region.size - len(empty_cells))
+        if count > min(capacity, len(empty_cells)):
+            raise ValueError(f"{count} creatures don't fit into the spawn region {self.spawn_region}: it has {len(empty_cells)} empty cells "
+                             f"of {region.size}, and spawn_density {self.spawn_density} allows {max(capacity, 0)} more creatures")
+
+        cells = empty_cells[self.rng.choice(len(empty_cells), size=count, replace=False)]
+        return (x_min + cells // region.shape[1]).astype(np.int64), (y_min + cells % region.shape[1]).astype(np.int64)
+
+    def spawn_population(self, count : int):
+        """Spawns count creatures into the map (see spawn_positions), and sets up the population arrays."""
+        self.x, self.y = self.spawn_positions(count)
+        self.map[self.x, self.y] = np.arange(1, count + 1)
+        self.heading_x = np.zeros(count, dtype=np.int64)
+        self.heading_y = np.zeros(count, dtype=np.int64)
+        self.occupancy_sat = None
 
     def get_empty_pos(self):
-        # Tries 10 000 times to find an empty random pos from map.
-        for i in range(10000):
-            x = np.random.randint(0, self.world_size)
-            y = np.random.randint(0, self.world_size)
-            if self.map[x][y] == 0:
-                return x, y
-        
-        print("no empty pos found after 10 000 iterations.")
-        return -1, -1
+        """Returns a random empty position (x, y) from the spawn region. Raises a ValueError if there is none."""
+        x, y = self.spawn_positions(1)
+        return int(x[0]), int(y[0])
+
+    def creature_at(self, x, y):
+        """Returns the index of the creature at (x, y), or -1 if the position is empty or out of bounds. x and y can be arrays."""
+        x = np.asarray(x)
+        y = np.asarray(y)
+        in_bounds = (x >= 0) & (x < self.world_size) & (y >= 0) & (y < self.world_size)
+        indexes = np.where(in_bounds, self.map[np.clip(x, 0, self.world_size - 1), np.clip(y, 0, self.world_size - 1)], 0) - 1
+        return int(indexes) if indexes.ndim == 0 else indexes
+
+    def get_occupancy_sat(self):
+        """
+        Returns the summed-area table of the occupied cells: sat[x][y] = count of creatures in map[:x, :y].
+        It's built at most once per step (moves clear it), and then any rectangle can be counted in O(1) (see count_in_rect).
+        """
+        if self.occupancy_sat is None:
+            self.occupancy_sat = np.zeros(shape=(self.world_size + 1, self.world_size + 1), dtype=np.int32)
+            np.cumsum(np.cumsum(self.map != 0, axis=0, dtype=np.int32), axis=1, out=self.occupancy_sat[1:, 1:])
+        return self.occupancy_sat
+
+    def count_in_rect(self, x_min, y_min, x_max, y_max):
+        """Returns the count of creatures in the rectangles (max values excluded). Rectangles are clipped to the map, the values can be arrays."""
+        sat = self.get_occupancy_sat()
+        x_min = np.clip(x_min, 0, self.world_size)
+        y_min = np.clip(y_min, 0, self.world_size)
+        x_max = np.clip(x_max, x_min, self.world_size)
+        y_max = np.clip(y_max, y_min, self.world_size)
+        return sat[x_max, y_max] - sat[x_min, y_max] - sat[x_max, y_min] + sat[x_min, y_min]
 
     def is_pos_in_bounds(self, x, y):
         """Returns true if the position was in bounds of the map."""
@@ -109,10 +215,85 @@ class Generation:
         new_x = x + x_change
         new_y = y + y_change
 
-        # Changes position IF (1. the new pos is in bounds) AND (2. the new pos doesn't have the value 1)
-        if self.is_pos_in_bounds(new_x, new_y) and self.map[new_x][new_y] != 1:
-            self.map[new_x][new_y] = 1
-            self.map[x][y] = 0
+        # Changes position IF (1. the new pos is in bounds) AND (2. the new pos is empty). The creature's index moves with it.
+        if self.is_pos_in_bounds(new_x, new_y) and self.map[new_x, new_y] == 0:
+            self.map[new_x, new_y] = self.map[x, y]
+            self.map[x, y] = 0
+            self.occupancy_sat = None
             return True
         else:
             return False
+
+    def queue_moves(self, ids : np.ndarray, x_change, y_change):
+        """
+        Queues moves for creatures. The moves are resolved and applied at the end of the step (see resolve_moves).
+        Every call is one round of moves, and a creature can be in a round only once.
+
+        Parameters
+        ----------
+            ids (np.ndarray): Ids of the creatures that move.
+            x_change (int or np.ndarray): Change in x for every creature.
+            y_change (int or np.ndarray): Change in y for every creature.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) > 0:
+            self.moves_queue.append((ids, np.broadcast_to(x_change, ids.shape), np.broadcast_to(y_change, ids.shape)))
+            self.heading_x[ids] = x_change
+            self.heading_y[ids] = y_change
+
+    def resolve_moves(self):
+        """
+        Resolves all queued moves and applies them, then clears the queue. A move fails if the new position is out of bounds or taken.
+
+        Move orders
+        -----------
+        - sequential: Moves are applied one at a time, creature by creature, and every creature's moves in the order they were queued.
+          This gives the same result as moving creatures with change_pos during Creature.update.
+        - bulk: Every round is applied at once. A move fails if the new position was taken at the start of the round.
+          If many creatures move to the same position, the creature with the smallest id gets it.
+        """
+        if len(self.moves_queue) == 0:
+            return
+        
+        rounds = self.moves_queue
+        self.moves_queue = []
+        self.occupancy_sat = None
+
+        if self.move_order == "sequential":
+            # Sort the moves by creature, and by queue order within a creature.
+            ids = np.concatenate([move_round[0] for move_round in rounds])
+            x_changes = np.concatenate([move_round[1] for move_round in rounds])
+            y_changes = np.concatenate([move_round[2] for move_round in rounds])
+            round_ids = np.repeat(np.arange(len(rounds)), [len(move_round[0]) for move_round in rounds])
+            order = np.lexsort((round_ids, ids))
+
+            for i, x_change, y_change in zip(ids[order].tolist(), x_changes[order].tolist(), y_changes[order].tolist()):
+                x = int(self.x[i])
+                y = int(self.y[i])
+                if self.change_pos(x, y, x_change, y_change):
+                    self.x[i] = x + x_change
+                    self.y[i] = y + y_change
+            return
+
+        for ids, x_changes, y_changes in rounds:
+            new_x = self.x[ids] + x_changes
+            new_y = self.y[ids] + y_changes
+
+            # Moves that stay in bounds and go to an empty position.
+            valid = (new_x >= 0) & (new_x < self.world_size) & (new_y >= 0) & (new_y < self.world_size)
+            valid[valid] = self.map[new_x[valid], new_y[valid]] == 0
+            ids, new_x, new_y = ids[valid], new_x[valid], new_y[valid]
+
+            # Only the smallest creature id moves to a position.
+            new_pos = new_x * self.world_size + new_y
+            order = np.lexsort((ids, new_pos))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = new_pos[order][1:] != new_pos[order][:-1]
+            winners = order[first]
+            ids, new_x, new_y = ids[winners], new_x[winners], new_y[winners]
+
+            # Apply the moves
+            self.map[self.x[ids], self.y[ids]] = 0
+            self.map[new_x, new_y] = ids + 1
+            self.x[ids] = new_x
+            self.y[ids] = new_y
@@ -0,0 +1,150 @@
+import os
+import time
+import traceback
+import multiprocessing
+import numpy as np
+from lab.bytedna import ByteDNA
+from lab.lab import Lab
+
+def island_worker(conn, island_i : int, bytedna : ByteDNA, selection_criteria : list, path : str, seed : int, lab_settings : dict):
+    """Runs a single island's Lab in its own process. Commands come from Islands through the pipe."""
+
+    lab = Lab(bytedna, selection_criteria, name=f"island_{island_i}", path=path, seed=seed, **lab_settings)
+
+    while True:
+        command, value = conn.recv()
+        try:
+            match command:
+                case "run":
+                    # Run generations and return the latest gen and survived count.
+                    for i in range(value):
+                        lab.run_generation()
+                    survived = len(lab.last_survived_genomes) // (bytedna.genome_len * bytedna.gene_bytes)
+                    conn.send(("ok", (lab.gen, survived)))
+                case "emigrants":
+                    # Return random survivors' genomes.
+                    genome_bytes = bytedna.genome_len * bytedna.gene_bytes
+                    survivors = np.frombuffer(lab.last_survived_genomes, dtype=np.uint8).reshape(-1, genome_bytes)
+                    chosen = bytedna.rng.choice(len(survivors), size=min(value, len(survivors)), replace=False)
+                    conn.send(("ok", bytes(survivors[chosen])))
+                case "immigrants":
+                    # Immigrants become parents of the next gen with the island's own survivors.
+                    # The gen's checkpoint is saved again, so a resumed island has the immigrants too.
+                    lab.last_survived_genomes = bytearray(lab.last_survived_genomes) + value
+                    if lab.checkpoint_interval > 0:
+                        lab.save_checkpoint()
+                    conn.send(("ok", None))
+                case "save":
+                    lab.save_gens()
+                    conn.send(("ok", None))
+                case "exit":
+                    lab.save_gens()
+                    conn.send(("ok", None))
+                    break
+                case _:
+                    # Every command gets a reply, otherwise Islands.send_all would wait for it forever.
+                    conn.send(("error", f"unknown command '{command}'"))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+class Islands:
+    def __init__(self, bytedna : ByteDNA, selection_criteria : list,
+                 islands : int = os.cpu_count(), migration_interval : int = 10, migrants : int = 2, topology : str = "ring",
+                 seed : int = None,
+                 name : str = "default",
+                 path : str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "saves"),
+                 **lab_settings):
+        """
+        Runs many Labs (islands) in parallel processes. Every migration_interval gens, some survivors' genomes migrate between the islands.
+        Every island saves into its own lab under saves/<name>/island_<i>.
+
+        Parameters
+        ----------
+            bytedna (ByteDNA): Bytedna of every island. Its neuron functions must be picklable (module level functions).
+            selection_criteria (list): Selection criteria of every island.
+            islands (int): Count of islands (processes).
+            migration_interval (int): Gens between migrations.
+            migrants (int): How many survivors' genomes every island sends in a migration.
+            topology (str): "ring" = island i sends to island i + 1, "random" = every migration sends to a random other island.
+            seed (int): Seed that the islands' lab seeds are derived from. None = every island uses its saved or a random seed.
+            lab_settings: Other Lab arguments (world_size, population, steps_per_gen, gens_per_save...).
+        """
+
+        if topology not in ("ring", "random"):
+            raise ValueError(f"topology must be 'ring' or 'random', not '{topology}'")
+
+        self.islands_count : int = islands
+        self.migration_interval : int = migration_interval
+        self.migrants : int = migrants
+        self.topology : str = topology
+        self.path = os.path.join(path, name)
+        self.rng = np.random.default_rng(seed)
+
+        # Start the island processes
+        os.makedirs(self.path, exist_ok=True)
+        if seed != None:
+            islands_seeds = [int(seed_sequence.generate_state(1, np.uint64)[0]) for seed_sequence in np.random.SeedSequence(seed).spawn(islands)]
+        else:
+            islands_seeds = [None] * islands
+        self.conns = []
+        self.processes = []
+        for island_i in range(islands):
+            conn, worker_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=island_worker, args=(worker_conn, island_i, bytedna, selection_criteria, self.path, islands_seeds[island_i], lab_settings), daemon=True)
+            process.start()
+            self.conns.append(conn)
+            self.processes.append(process)
+
+
+    def send_all(self, commands : list):
+        """Sends a (command, value) to every island, and returns their results when all of them are done."""
+        for conn, command in zip(self.conns, commands):
+            conn.send(command)
+
+        results = []
+        for island_i, conn in enumerate(self.conns):
+            status, result = conn.recv()
+            if status == "error":
+                raise RuntimeError(f"island {island_i} failed:\n{result}")
+            results.append(result)
+        return results
+
+    def run_generations(self, count : int):
+        start_time = time.time()
+
+        gens_done = 0
+        while gens_done < count:
+            gens = min(self.migration_interval, count - gens_done)
+            results = self.send_all([("run", gens)] * self.islands_count)
+            gens_done += gens
+            print(f"[{int(time.time() - start_time)}s / gen {results[0][0]}] survived = {[survived for gen, survived in results]}")
+
+            if gens_done < count:
+                self.migrate()
+
+        self.send_all([("save", None)] * self.islands_count)
+
+    def migrate(self):
+        """Sends migrants from every island to its target island."""
+        if self.islands_count < 2 or self.migrants <= 0:
+            return
+
+        # Choose targets by the topology
+        if self.topology == "ring":
+            targets = [(island_i + 1) % self.islands_count for island_i in range(self.islands_count)]
+        else:
+            targets = self.rng.permutation(self.islands_count)
+            while np.any(targets == np.arange(self.islands_count)):
+                targets = self.rng.permutation(self.islands_count)
+
+        emigrants = self.send_all([("emigrants", self.migrants)] * self.islands_count)
+        immigrants = [b""] * self.islands_count
+        for island_i, target_i in enumerate(targets):
+            immigrants[target_i] += emigrants[island_i]
+        self.send_all([("immigrants", genomes) for genomes in immigrants])
+
+    def close(self):
+        """Saves every island and stops the processes."""
+        self.send_all([("exit", None)] * self.islands_count)
+        for process in self.processes:
+            process.join()
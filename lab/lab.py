@@ -1,74 +1,218 @@
 import os
 import json
 import time
+import random
+import numpy as np
+from collections import deque
 from lab.bytedna import ByteDNA
 from lab.generation import Generation
+from lab.archive import GenomeArchive, CompressedGenomeArchive, StatsLog
+from lab.checkpoint import save_checkpoint, load_checkpoint
+from lab.recording import StepRecorder
+from lab.profiling import PhaseTimer, export_chrome_trace
+from lab.selection import Selection
 
 class Lab:
     def __init__(self, bytedna : ByteDNA, selection_criteria : list, 
                  world_size : int = 32, population : int = 128, steps_per_gen : int = 128,
                  gens_per_save : int = 100,
+                 move_order : str = "sequential",
+                 spawn_region : tuple = None, spawn_density : float = 1.0,
+                 diversity_interval : int = 1, diversity_samples : int = 0,
+                 checkpoint_interval : int = 10, archive_format : str = "raw",
+                 seed : int = None,
+                 record_gens = None, record_budget : int = 1024 ** 3,
+                 profile_memory : bool = False, trace_gens : int = 1000,
                  name : str = "default", 
                  path : str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "saves")):
         
         # Setup Lab's variables.
         self.bytedna : ByteDNA = bytedna
         self.selection_criteria : list = selection_criteria
+        self.selection : Selection = Selection(selection_criteria) # Criteria compiled once for every gen's selection.
         self.world_size : int = world_size
         self.population : int = population
         self.steps_per_gen : int = steps_per_gen
         self.gens_per_save : int = gens_per_save
+        self.move_order : str = move_order
+        self.spawn_region : tuple = spawn_region # Rectangle (x_min, y_min, x_max, y_max) where creatures spawn. None = the whole map.
+        self.spawn_density : float = spawn_density # Max share of the spawn region's cells that creatures may fill.
+        self.diversity_interval : int = diversity_interval # Diversity is calculated every diversity_interval gens (see get_diversity).
+        if diversity_interval < 1:
+            raise ValueError(f"diversity_interval must be at least 1, not {diversity_interval}")
+        self.diversity_samples : int = diversity_samples
+        self.checkpoint_interval : int = checkpoint_interval
+        self.archive_format : str = archive_format
+        self.seed : int = seed # Lab's seed. None = saved lab's seed, or a random seed for a new lab.
+        self.profile_memory : bool = profile_memory # Measures phases' memory peaks with tracemalloc (slow).
 
         # Setup Lab Generations variables.
         self.gen : int = -1
         self.last_survived_genomes = None
+        self.last_gen_stats = None # Stats of the latest new gen (the unsaved gens are cleared by saves)
         self.unsaved_gens_genomes = bytearray()
         self.unsaved_gens_stats = []
+        self.stats_without_genomes : bool = False # The save had stats but no genome archive, so its stats are kept aside when gens are saved.
+
+        # Phase timers of the latest gens for trace exports (see export_trace), and the time of the latest autosave or checkpoint.
+        self.gens_timers = deque(maxlen=trace_gens)
+        self.last_save_time : float = 0.0
 
         # Create the path
         self.path = os.path.join(path, name)
 
         self.try_load_lab()
+
+        # Step recordings of selected gens (see StepRecorder). Recordings of gens that were cut out of the save are removed.
+        self.recorder = StepRecorder(os.path.join(self.path, "steps"), record_gens, record_budget)
+        self.recorder.truncate(self.gen + 1)
     
 
     def run_generation(self, genomes = None, new_gen = True, return_steps_data = False, debug = False):
         if new_gen == True:
             self.gen += 1
 
+        # A new gen uses random generators seeded by (lab seed, gen), so it can be replayed. Other runs use random seeds.
+        gen_seed = self.get_gen_seed(self.gen) if new_gen == True else None
+        dna_rng, generation_rng = self.get_gen_rngs(gen_seed)
+        if new_gen == True:
+            self.bytedna.rng = dna_rng
+
         gen_stats = {
             "survived": 0,
-            "diversity": 0
+            "diversity": 0,
+            "seed": gen_seed
         }
-
-        # Get the genomes for this generation (if genomes haven't been imported)
-        # [Gen 0] genomes are random
-        # [Gen 1+] genomes are crossovered
-        if genomes == None:
-            if self.gen == 0:
-                genomes = self.bytedna.random_genomes(self.population)
-            else:
-                genomes = self.bytedna.crossover(self.last_survived_genomes, self.population)
+        timer = PhaseTimer(self.profile_memory)
+        try:
+            # Get the genomes for this generation (if genomes haven't been imported)
+            # [Gen 0] genomes are random
+            # [Gen 1+] genomes are crossovered
+            if genomes == None:
+                if self.gen == 0:
+                    genomes = self.bytedna.random_genomes(self.population)
+                else:
+                    with timer.phase("crossover"):
+                        genomes = self.bytedna.crossover(self.last_survived_genomes, self.population, mutate=False)
+                    with timer.phase("mutation"):
+                        self.bytedna.mutate(genomes)
         
-        # Create the new generation and run it
-        generation = Generation(genomes, self.bytedna, self.world_size, self.population, self.steps_per_gen)
-        generation.run(return_steps_data, debug)
+            # Stream the gen's steps to the disk, if it's selected to be recorded.
+            recording = None
+            if new_gen == True:
+                population = len(genomes) // (self.bytedna.genome_len * self.bytedna.gene_bytes)
+                if self.recorder.should_record(self.gen, self.world_size, population, self.steps_per_gen):
+                    recording = self.recorder.create(self.gen, self.world_size, population, self.steps_per_gen)
 
-        # Get survived creatures genomes and save them to the lab. So the next gen can use these as parens.
-        if new_gen == True:
-            self.last_survived_genomes = generation.get_selection_genomes(self.selection_criteria)
+            # Create the new generation and run it
+            generation = self.new_generation(genomes, generation_rng)
+            generation.run(return_steps_data, debug, recording=recording, timer=timer)
+            if recording != None:
+                self.recorder.add(self.gen, recording)
+
+            # Get survived creatures genomes and save them to the lab. So the next gen can use these as parens.
+            if new_gen == True:
+                with timer.phase("selection"):
+                    self.last_survived_genomes = generation.get_selection_genomes(self.selection)
             
-            gen_stats["survived"] = len(self.bytedna.get_separated_genomes(self.last_survived_genomes))
-            gen_stats["diversity"] = self.bytedna.average_hamming_distance(genomes, self.population)
-            self.unsaved_gens_stats.append(gen_stats)
-            self.unsaved_gens_genomes.extend(genomes)
+                gen_stats["survived"] = len(self.bytedna.get_separated_genomes(self.last_survived_genomes))
+                with timer.phase("diversity"):
+                    gen_stats["diversity"] = self.get_diversity(genomes)
+                with timer.phase("archive"):
+                    self.unsaved_gens_genomes.extend(genomes)
+
+                # Phases' times. "archive" also has the time of the genome archive's write, if this gen autosaves (see save_gens).
+                # The rest of the save is written after the gen's stats, so "save" is the previous gen's stats log write and checkpoint.
+                timer.counters["survived"] = gen_stats["survived"]
+                gen_stats.update(timer.get_stats())
+                gen_stats["phases"]["save"] = round(self.last_save_time, 6)
+                self.last_save_time = 0.0
+                self.unsaved_gens_stats.append(gen_stats)
+                self.last_gen_stats = gen_stats
+                self.gens_timers.append((self.gen, timer))
 
-            # Possible auto save
-            if len(self.unsaved_gens_stats) >= self.gens_per_save:
-                self.save_gens()
+                # Possible auto save (it also saves a checkpoint), or a checkpoint
+                if len(self.unsaved_gens_stats) >= self.gens_per_save:
+                    self.save_gens(timer)
+                elif self.checkpoint_interval > 0 and (self.gen + 1) % self.checkpoint_interval == 0:
+                    with timer.phase("save"):
+                        self.save_checkpoint()
+                self.last_save_time = timer.phases.get("save", 0.0)
+        finally:
+            # Memory profiling ends with the gen (also runs that aren't new gens, or fail), so it doesn't slow down the rest of the process.
+            timer.stop()
 
         if return_steps_data == True:
             return generation.steps_data
     
+    def replay_generation(self, gen : int, save_steps : bool = True):
+        """
+        Runs an already simulated gen again from its saved genomes and seed. The result is exactly the same as the original run,
+        so steps don't have to be saved while running the lab. Returns the gen's steps_data.
+        Raises a ValueError if the gen can't be replayed exactly (see get_replay_seed).
+        """
+        genomes = self.load_gen(gen)
+        dna_rng, generation_rng = self.get_gen_rngs(self.get_replay_seed(gen))
+
+        generation = self.new_generation(genomes, generation_rng)
+        generation.run(save_steps)
+        return generation.steps_data
+
+    def new_generation(self, genomes : bytearray, generation_rng : np.random.Generator):
+        """Returns a Generation of the genomes with the lab's settings."""
+        return Generation(genomes, self.bytedna, self.world_size, self.population, self.steps_per_gen, self.move_order, generation_rng,
+                          self.spawn_region, self.spawn_density)
+
+    def load_recording(self, gen : int):
+        """Returns a recorded gen's steps (StepRecording), read lazily from the disk. See record_gens."""
+        return self.recorder.load(gen)
+
+    def export_trace(self, filepath : str):
+        """Writes the phases of the latest gens (see trace_gens) as a Chrome trace JSON, which opens in chrome://tracing or Perfetto."""
+        export_chrome_trace(filepath, list(self.gens_timers))
+
+    def load_gen_stats(self, gen : int):
+        """Returns a single gen's stats, from the unsaved gens or by streaming the stats log until the gen."""
+        saved_gens = self.archive.gen_count
+        if gen >= saved_gens:
+            if gen - saved_gens >= len(self.unsaved_gens_stats):
+                raise IndexError(f"gen {gen} has not been run")
+            return self.unsaved_gens_stats[gen - saved_gens]
+        return next(self.stats_log.iter_stats(gen))
+
+    def get_replay_seed(self, gen : int):
+        """
+        Returns the seed that the gen was run with, from its stats. Raises a ValueError if the gen has no seed (it was run before
+        seeds were saved, or without a new gen), or if the seed isn't the lab's seed for the gen (the lab's seed has changed).
+        """
+        gen_seed = self.load_gen_stats(gen).get("seed")
+        if gen_seed == None:
+            raise ValueError(f"gen {gen} has no recorded seed (it was run before seeds were saved), so it can't be replayed exactly")
+        if gen_seed != self.get_gen_seed(gen):
+            raise ValueError(f"gen {gen} was run with seed {gen_seed}, but the lab's seed gives {self.get_gen_seed(gen)}, so it can't be replayed exactly")
+        return gen_seed
+
+    def get_gen_seed(self, gen : int):
+        """Returns the gen's seed, derived from the lab's seed and the gen number."""
+        return int(np.random.SeedSequence([self.seed, gen]).generate_state(1, np.uint64)[0])
+
+    @staticmethod
+    def get_gen_rngs(gen_seed : int):
+        """Returns the gen's random generators: one for the bytedna (crossover and mutations), and one for the generation. None = random seed."""
+        dna_seed_sequence, generation_seed_sequence = np.random.SeedSequence(gen_seed).spawn(2)
+        return np.random.default_rng(dna_seed_sequence), np.random.default_rng(generation_seed_sequence)
+
+    def get_diversity(self, genomes : bytearray):
+        """
+        Returns the diversity of the genomes for this gen's stats.
+        It's calculated every diversity_interval gens (None on other gens), and estimated from random pairs if diversity_samples > 0.
+        """
+        if self.gen % self.diversity_interval != 0:
+            return None
+        if self.diversity_samples > 0:
+            return self.bytedna.sampled_hamming_distance(genomes, self.population, self.diversity_samples)
+        return self.bytedna.average_hamming_distance(genomes, self.population)
+
     def run_generations(self, count : int):
         start_time = time.time()
 
@@ -83,7 +227,9 @@ class Lab:
     def try_load_lab(self):
         properties_filepath = os.path.join(self.path, "properties.json")
         genomes_filepath = os.path.join(self.path, "genomes.bin")
-        stats_filepath = os.path.join(self.path, "stats.json")
+        compressed_genomes_filepath = os.path.join(self.path, "genomes")
+        stats_filepath = os.path.join(self.path, "stats.jsonl")
+        old_stats_filepath = os.path.join(self.path, "stats.json")
 
         # Setup directories for the lab "project".
         os.makedirs(self.path, exist_ok=True)
@@ -101,6 +247,7 @@ class Lab:
                 elif properties["gene_bytes"] != self.bytedna.gene_bytes: lab_properties_match = False
                 elif properties["inner_neurons"] != self.bytedna.inner_neurons: lab_properties_match = False
                 elif properties["mutation_interval"] != self.bytedna.mutation_interval: lab_properties_match = False
+                elif properties.get("mutation_model", "gene") != self.bytedna.mutation_model: lab_properties_match = False
                 elif properties["source_id_len"] != self.bytedna.source_id_len: lab_properties_match = False
                 elif properties["sink_id_len"] != self.bytedna.sink_id_len: lab_properties_match = False
                 elif properties["weight_len"] != self.bytedna.weight_len: lab_properties_match = False
@@ -108,13 +255,37 @@ class Lab:
                 elif properties["world_size"] != self.world_size: lab_properties_match = False
                 elif properties["population"] != self.population: lab_properties_match = False
                 elif properties["steps_per_gen"] != self.steps_per_gen: lab_properties_match = False
+                elif self.seed != None and properties.get("seed", self.seed) != self.seed: lab_properties_match = False
+                elif properties.get("move_order", self.move_order) != self.move_order: lab_properties_match = False
+                elif properties.get("spawn_region", self.get_spawn_region_property()) != self.get_spawn_region_property(): lab_properties_match = False
+                elif properties.get("spawn_density", self.spawn_density) != self.spawn_density: lab_properties_match = False
                 if lab_properties_match == False:
                     print("\033[31mALL LAB PROPERTIES DID NOT MATCH, MAKE SURE THAT YOUR LAB PROPERTIES MATCH WITH THE PROPERTIES IN THE SAVE'S 'properties.json'\033[0m")
                     print("\033[33mEXITING THE PROGRAM\033[0m")
                     exit()
 
+            # Use the saved seed. Saves from before seeds get one now, and saves from before the replay settings get the current settings.
+            properties_changed = False
+            if properties.get("seed") != None:
+                self.seed = properties["seed"]
+            else:
+                if self.seed == None:
+                    self.seed = self.get_random_seed()
+                properties["seed"] = self.seed
+                properties_changed = True
+            replay_properties = {"move_order": self.move_order, "spawn_region": self.get_spawn_region_property(), "spawn_density": self.spawn_density}
+            for name, value in replay_properties.items():
+                if not name in properties:
+                    properties[name] = value
+                    properties_changed = True
+            if properties_changed == True:
+                with open(properties_filepath, "w") as file:
+                    file.write(json.dumps(properties, indent=4))
+
         # Lab project doesn't exist, so it creates one with saved lab properties.
         else:
+            if self.seed == None:
+                self.seed = self.get_random_seed()
             with open(properties_filepath, "w") as file:
                 properties = {
                     "inputs_len": len(self.bytedna.inputs),
@@ -123,70 +294,192 @@ class Lab:
                     "gene_bytes": self.bytedna.gene_bytes,
                     "inner_neurons": self.bytedna.inner_neurons,
                     "mutation_interval": self.bytedna.mutation_interval,
+                    "mutation_model": self.bytedna.mutation_model,
                     "source_id_len": self.bytedna.source_id_len,
                     "sink_id_len": self.bytedna.sink_id_len,
                     "weight_len": self.bytedna.weight_len,
                     "weight_range": self.bytedna.weight_range,
                     "world_size": self.world_size,
                     "population": self.population,
-                    "steps_per_gen": self.steps_per_gen
+                    "steps_per_gen": self.steps_per_gen,
+                    "seed": self.seed,
+                    "move_order": self.move_order,
+                    "spawn_region": self.get_spawn_region_property(),
+                    "spawn_density": self.spawn_density
                 }
                 file.write(json.dumps(properties, indent=4))
 
-        # Load the needed lab data to continue simulating evolution.
-        if os.path.isfile(genomes_filepath) and os.path.isfile(stats_filepath):
-            genomes, stats = self.load_gens()
-            self.gen = len(stats) - 1
-            self.last_survived_genomes = genomes[-(self.bytedna.gene_bytes * self.bytedna.genome_len * self.population):]
+        # Open the genome archive and the stats log. Old saves' stats.json is converted to the log once.
+        # An existing archive keeps its format, archive_format is used for new labs ("raw", "zlib" or "lzma").
+        if os.path.isfile(compressed_genomes_filepath + ".zidx") or (self.archive_format != "raw" and not os.path.isfile(genomes_filepath)):
+            self.archive = CompressedGenomeArchive(compressed_genomes_filepath, self.population, self.bytedna.genome_len, self.bytedna.gene_bytes, self.archive_format)
+        else:
+            self.archive = GenomeArchive(genomes_filepath, self.population, self.bytedna.genome_len, self.bytedna.gene_bytes)
+        self.stats_log = StatsLog(stats_filepath)
+        if os.path.isfile(old_stats_filepath) and not os.path.isfile(stats_filepath):
+            self.stats_log.convert_json(old_stats_filepath)
+
+        # A save that has stats but no genomes (like saves that kept only stats.json) can't continue those gens, so its stats are
+        # kept as they are, and moved aside when the first gens are saved. (Genomes are written before stats, so a crash can't cause this)
+        if self.archive.gen_count == 0 and self.stats_log.file_size > 0:
+            print(f"\033[33mTHE SAVE HAS STATS OF {self.stats_log.count} GENS BUT NO GENOMES, THE GENS START FROM 0 AND THE OLD STATS ARE MOVED TO '{os.path.basename(stats_filepath)}.old' WHEN GENS ARE SAVED\033[0m")
+            self.stats_without_genomes = True
+            self.stats_log.sync_columns()
+
+        # Continue from the latest checkpoint if it matches the saved gens. (The log isn't read, so this takes the same time for any count of gens)
+        if self.try_load_checkpoint() or self.stats_without_genomes == True:
+            return
+
+        # Else load the needed lab data to continue simulating evolution. Only the last gen's genomes are read from the archive.
+        # Gens that were saved only partly (a crash during a save) are cut out.
+        saved_gens = min(self.archive.gen_count, self.stats_log.count)
+        self.archive.truncate(saved_gens)
+        self.stats_log.truncate(saved_gens)
+        self.stats_log.sync_columns(saved_gens)
+        if saved_gens > 0:
+            self.gen = saved_gens - 1
+            self.last_survived_genomes = bytearray(self.archive.get_gen(-1))
 
-    def save_gens(self):
+    def get_spawn_region_property(self):
+        """Returns spawn_region as it's saved in properties.json (a list, or None = the whole map)."""
+        return list(self.spawn_region) if self.spawn_region != None else None
+
+    def get_random_seed(self):
+        return int(np.random.SeedSequence().generate_state(1, np.uint64)[0])
+
+    def save_checkpoint(self):
+        """
+        Saves a checkpoint (checkpoint.bin) that has everything needed to continue the lab exactly from this gen:
+        gen, last survived genomes, unsaved gens and random generators' states.
+        """
+        save_checkpoint(os.path.join(self.path, "checkpoint.bin"), {
+            "gen": self.gen,
+            "archive_size": self.archive.file_size,
+            "stats_size": self.stats_log.file_size,
+            "columns_size": self.stats_log.columns_file_size,
+            "last_survived_genomes": bytes(self.last_survived_genomes) if self.last_survived_genomes != None else None,
+            "unsaved_gens_genomes": bytes(self.unsaved_gens_genomes),
+            "unsaved_gens_stats": self.unsaved_gens_stats,
+            "bytedna_rng_state": self.bytedna.rng.bit_generator.state,
+            "numpy_rng_state": self.get_numpy_rng_state(),
+            "python_rng_state": self.get_python_rng_state()
+        })
+
+    def try_load_checkpoint(self):
+        """
+        Loads the checkpoint, if the saved files are the same size as when it was saved. Otherwise the checkpoint is old (or the files changed), and it's not used.
+        Returns true if the checkpoint was loaded.
+        """
+        checkpoint = load_checkpoint(os.path.join(self.path, "checkpoint.bin"))
+        if checkpoint == None:
+            return False
+        if checkpoint["archive_size"] != self.archive.file_size or checkpoint["stats_size"] != self.stats_log.file_size:
+            return False
+
+        # The stats' columns file is synced with the log only if it changed after the checkpoint (or the checkpoint is older than the columns file).
+        if checkpoint.get("columns_size") != self.stats_log.columns_file_size:
+            self.stats_log.sync_columns()
+
+        self.gen = checkpoint["gen"]
+        self.last_survived_genomes = bytearray(checkpoint["last_survived_genomes"]) if checkpoint["last_survived_genomes"] != None else None
+        self.unsaved_gens_genomes = bytearray(checkpoint["unsaved_gens_genomes"])
+        self.unsaved_gens_stats = checkpoint["unsaved_gens_stats"]
+        self.bytedna.rng.bit_generator.state = checkpoint["bytedna_rng_state"]
+        self.set_numpy_rng_state(checkpoint["numpy_rng_state"])
+        self.set_python_rng_state(checkpoint["python_rng_state"])
+        return True
+
+    # The global random generators' states as lists (JSON), for checkpoints.
+    @staticmethod
+    def get_numpy_rng_state():
+        bit_generator, key, pos, has_gauss, cached_gaussian = np.random.get_state()
+        return [bit_generator, key.tolist(), pos, has_gauss, cached_gaussian]
+
+    @staticmethod
+    def set_numpy_rng_state(state : list):
+        bit_generator, key, pos, has_gauss, cached_gaussian = state
+        np.random.set_state((bit_generator, np.array(key, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+
+    @staticmethod
+    def get_python_rng_state():
+        version, internal_state, gauss_next = random.getstate()
+        return [version, list(internal_state), gauss_next]
+
+    @staticmethod
+    def set_python_rng_state(state : list):
+        version, internal_state, gauss_next = state
+        random.setstate((version, tuple(internal_state), gauss_next))
+
+    def save_gens(self, timer : PhaseTimer = None):
+        """
+        Appends the unsaved gens to the genome archive and the stats log, and saves a checkpoint.
+        The archive write is measured as the "archive" phase, and its time is added to the latest gen's stats before they are written.
+        The stats log and checkpoint writes are measured as the "save" phase.
+
+        Parameters
+        ----------
+            timer (PhaseTimer): Timer of the latest gen (see run_generation). None = a new timer.
+        """
         start_time = time.time()
-        genomes_filepath = os.path.join(self.path, "genomes.bin")
-        stats_filepath = os.path.join(self.path, "stats.json")
+        timer = timer if timer != None else PhaseTimer()
 
-        # Creates the files if they do not exist.
-        if not os.path.isfile(genomes_filepath):
-            open(genomes_filepath, "xb")
-        if not os.path.isfile(stats_filepath):
-            open(stats_filepath, "x")
-        
-        # Open the gens file for appending binary
-        with open(genomes_filepath, "ab") as file:
-            file.write(self.unsaved_gens_genomes)
-
-        # Open the stats file for reading + writing
-        with open(stats_filepath, "r+") as file:
-            # Load old data if there is.
-            gens_stats = [] 
-            content = file.read()
-            if content != "":
-                gens_stats = json.loads(content)
-
-            # Extend old data with new, and write it to the beginning of the file.
-            gens_stats.extend(self.unsaved_gens_stats)
-            file.seek(0)
-            file.write(json.dumps(gens_stats))
-            file.truncate() # Clears possible old data, if write length was smaller than the original file length.
-        
-        self.unsaved_gens_genomes = bytearray()
-        self.unsaved_gens_stats = []
+        # Keep the stats of a save without genomes aside, so the log's gens match the archive's gens.
+        if self.stats_without_genomes == True:
+            self.stats_log.move_aside(".old")
+            self.stats_without_genomes = False
+
+        # Append the gens to the genome archive and the stats log
+        with timer.phase("archive"):
+            self.archive.append(self.unsaved_gens_genomes)
+        if len(self.unsaved_gens_stats) > 0 and "phases" in self.unsaved_gens_stats[-1]:
+            phases = self.unsaved_gens_stats[-1]["phases"]
+            phases["archive"] = round(phases.get("archive", 0.0) + timer.events[-1][2], 6)
+        with timer.phase("save"):
+            self.stats_log.append(self.unsaved_gens_stats)
+
+            self.unsaved_gens_genomes = bytearray()
+            self.unsaved_gens_stats = []
+            if self.checkpoint_interval > 0:
+                self.save_checkpoint()
         print(f"save_time = {round(time.time() - start_time, 4)}s")
 
     def load_gens(self):
+        """Returns all gens' genomes (bytes) and stats (list). This reads the whole archive, use load_gen to get a single gen."""
+
         # Save if there are gens not saved
         if len(self.unsaved_gens_stats) > 0:
             self.save_gens()
         
-        # Load the file into an object and return it.
-        
-        genomes_filepath = os.path.join(self.path, "genomes.bin")
-        stats_filepath = os.path.join(self.path, "stats.json")
-
-        gens_genomes : bytearray = None
-        gens_stats = None
-        with open(genomes_filepath, "rb") as file:
-            gens_genomes = file.read()
-        with open(stats_filepath, "r") as file:
-            gens_stats = json.loads(file.read())
+        # Load the files into objects and return them.
+        gens_genomes : bytes = self.archive.get_gens(0, self.archive.gen_count).tobytes()
+        gens_stats : list = self.stats_log.read()
         
         return gens_genomes, gens_stats
+
+    def load_stats(self):
+        """Returns all gens' stats (saved and unsaved) without touching the genome archive."""
+        return self.stats_log.read() + self.unsaved_gens_stats
+
+    def load_stats_columns(self, start : int = 0):
+        """
+        Returns the numeric stats (survived and diversity) of the gens from the start gen as a dictionary of float64 arrays.
+        Saved gens are read from the stats log's columns file, so the log isn't parsed.
+        """
+        columns = self.stats_log.read_columns(min(start, self.stats_log.columns_count))
+        unsaved_gens_stats = self.unsaved_gens_stats[max(start - self.stats_log.columns_count, 0):]
+        for column in columns:
+            unsaved_values = [gen_stats[column] if gen_stats[column] != None else np.nan for gen_stats in unsaved_gens_stats]
+            columns[column] = np.concatenate([columns[column], np.array(unsaved_values, dtype=np.float64)])
+        return columns
+
+    def load_gen(self, gen : int):
+        """Returns a single gen's genomes as a bytearray. Reads only that gen from the archive, or from the unsaved gens."""
+        saved_gens = self.archive.gen_count
+        if gen < saved_gens:
+            return bytearray(self.archive.get_gen(gen))
+
+        gen_bytes = self.archive.gen_bytes
+        unsaved_i = gen - saved_gens
+        if unsaved_i * gen_bytes >= len(self.unsaved_gens_genomes):
+            raise IndexError(f"gen {gen} has not been run")
+        return self.unsaved_gens_genomes[unsaved_i * gen_bytes : (unsaved_i + 1) * gen_bytes]
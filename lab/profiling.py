@@ -0,0 +1,87 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+class PhaseTimer:
+    def __init__(self, trace_memory : bool = False):
+        """
+        Measures the wall time of a generation's phases (spawn, brain compile, stepping...).
+        A phase can be measured many times, its times are summed.
+
+        Parameters
+        ----------
+            trace_memory (bool): Also measures every phase's peak of traced memory with tracemalloc. This slows everything down.
+        """
+
+        self.trace_memory : bool = trace_memory
+        self.phases = {} # Seconds per phase
+        self.memory_peaks = {} # Peak traced bytes per phase
+        self.events = [] # Measurements (phase, start time, duration) in order, for traces
+        self.counters = {} # Other numbers of the gen, like the count of creatures
+
+        # Tracing is started only if it isn't on already, and then stop turns it off again.
+        self.started_tracing : bool = False
+        if trace_memory == True and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+
+    @contextmanager
+    def phase(self, name : str):
+        """Measures the code inside the with block as the phase."""
+        if self.trace_memory == True:
+            tracemalloc.reset_peak()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start_time
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+            self.events.append((name, start_time, duration))
+            if self.trace_memory == True:
+                self.memory_peaks[name] = max(self.memory_peaks.get(name, 0), tracemalloc.get_traced_memory()[1])
+
+    def stop(self):
+        """Stops tracemalloc if this timer started it. Tracing slows down everything in the process, also after the timer is used."""
+        if self.started_tracing == True:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def get_stats(self):
+        """Returns the measurements for gen stats: phases' times (and memory peaks) and counters."""
+        stats = {"phases": {name: round(seconds, 6) for name, seconds in self.phases.items()}}
+        if self.trace_memory == True:
+            stats["memory_peaks"] = dict(self.memory_peaks)
+        stats.update(self.counters)
+        return stats
+
+def export_chrome_trace(filepath : str, gens_timers : list):
+    """
+    Writes gens' phases as a Chrome trace JSON (opened in chrome://tracing or Perfetto).
+    Every gen is an event with its phases inside it, and the counters are counter tracks.
+
+    Parameters
+    ----------
+        gens_timers (list): (gen, PhaseTimer) pairs.
+    """
+
+    events = []
+    for gen, timer in gens_timers:
+        if len(timer.events) == 0:
+            continue
+        gen_start = min(start_time for name, start_time, duration in timer.events)
+        gen_end = max(start_time + duration for name, start_time, duration in timer.events)
+        events.append({"name": f"gen {gen}", "cat": "gen", "ph": "X", "pid": 0, "tid": 0,
+                       "ts": gen_start * 1e6, "dur": (gen_end - gen_start) * 1e6, "args": {"gen": gen}})
+        for name, start_time, duration in timer.events:
+            args = {"gen": gen}
+            if name in timer.memory_peaks:
+                args["memory_peak"] = timer.memory_peaks[name]
+            events.append({"name": name, "cat": "phase", "ph": "X", "pid": 0, "tid": 0,
+                           "ts": start_time * 1e6, "dur": duration * 1e6, "args": args})
+        for name, value in timer.counters.items():
+            events.append({"name": name, "ph": "C", "pid": 0, "tid": 0, "ts": gen_start * 1e6, "args": {name: value}})
+
+    with open(filepath, "w") as file:
+        file.write(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
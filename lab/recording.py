@@ -0,0 +1,169 @@
+import os
+import json
+import numpy as np
+
+class StepRecording:
+    def __init__(self, world_size : int, population : int, steps : int, filepath : str = None):
+        """
+        Records creatures' positions of every step into a preallocated (steps, population, 2) array.
+        Maps (frames) are not saved, they are rebuilt from the positions when a viewer needs them.
+
+        Parameters
+        ----------
+            world_size (int): Generation's world size. Positions are saved as uint8 if they fit, otherwise uint16.
+            population (int): Count of creatures.
+            steps (int): Count of steps to record.
+            filepath (str): Records into a memory-mapped .npy file instead of memory. None = records into memory.
+        """
+
+        self.world_size : int = world_size
+        self.population : int = population
+        self.dtype = np.uint8 if world_size <= 256 else np.uint16
+        if filepath == None:
+            self.positions : np.ndarray = np.zeros(shape=(steps, population, 2), dtype=self.dtype)
+        else:
+            self.positions : np.ndarray = np.lib.format.open_memmap(filepath, mode="w+", dtype=self.dtype, shape=(steps, population, 2))
+        self.steps_count : int = 0 # Count of recorded steps
+
+    @classmethod
+    def open(cls, filepath : str, world_size : int):
+        """Opens a recording from a .npy file. The file is memory-mapped, so steps are read from the disk only when they are used."""
+        recording = cls(world_size, 0, 0)
+        recording.positions = np.load(filepath, mmap_mode="r")
+        recording.population = recording.positions.shape[1]
+        recording.dtype = recording.positions.dtype
+        recording.steps_count = len(recording.positions)
+        return recording
+
+
+    def record(self, x : np.ndarray, y : np.ndarray):
+        """Records creatures' positions as the next step."""
+        self.positions[self.steps_count, :, 0] = x
+        self.positions[self.steps_count, :, 1] = y
+        self.steps_count += 1
+
+    def flush(self):
+        """Writes a memory-mapped recording's changes to its file."""
+        if isinstance(self.positions, np.memmap):
+            self.positions.flush()
+
+    def get_positions(self, step : int):
+        """Returns the step's positions as a (population, 2) array of x and y."""
+        return self.positions[:self.steps_count][step]
+
+    def get_frame(self, step : int):
+        """Returns the step's map (world_size, world_size), where 1 = creature and 0 = empty."""
+        positions = self.get_positions(step)
+        frame = np.zeros(shape=(self.world_size, self.world_size), dtype=np.int8)
+        frame[positions[:, 0], positions[:, 1]] = 1
+        return frame
+
+    def __len__(self):
+        return self.steps_count
+
+    def __getitem__(self, step : int):
+        # Same format as the old steps_data list ({"map": map} per step), the map is built when it's used.
+        if step < -self.steps_count or step >= self.steps_count:
+            raise IndexError(f"step {step} has not been recorded")
+        return {"map": self.get_frame(step)}
+
+    def __iter__(self):
+        for step in range(self.steps_count):
+            yield self[step]
+
+class StepRecorder:
+    def __init__(self, path : str, record_gens = None, budget : int = 1024 ** 3):
+        """
+        Streams selected gens' steps into memory-mapped .npy files (gen_<gen>.npy) in a directory, until the disk budget is used.
+        Recorded gens are listed in the directory's index.json, so gens with a partly written file (a crash) aren't listed.
+
+        Parameters
+        ----------
+            path (str): Directory of the recordings.
+            record_gens (int or list): int = records every Nth gen, list = records these gens. None = records nothing.
+            budget (int): Max bytes of all recordings. Gens that don't fit anymore aren't recorded.
+        """
+
+        self.path : str = path
+        self.record_gens = record_gens
+        self.budget : int = budget
+        self.index_filepath : str = os.path.join(path, "index.json")
+        self.budget_warned : bool = False
+
+        # Recorded gens: {gen: {"world_size", "population", "steps", "size"}}
+        self.index = {}
+        if os.path.isfile(self.index_filepath):
+            with open(self.index_filepath, "r") as file:
+                self.index = {int(gen): info for gen, info in json.loads(file.read()).items()}
+
+
+    @property
+    def used_bytes(self):
+        return sum(info["size"] for info in self.index.values())
+
+    @property
+    def gens(self):
+        """Recorded gens in order."""
+        return sorted(self.index.keys())
+
+    def get_filepath(self, gen : int):
+        return os.path.join(self.path, f"gen_{gen}.npy")
+
+    def should_record(self, gen : int, world_size : int, population : int, steps : int):
+        """Returns true if the gen is selected to be recorded and its recording fits into the disk budget."""
+        if self.record_gens == None:
+            return False
+        if isinstance(self.record_gens, int):
+            if self.record_gens <= 0 or gen % self.record_gens != 0:
+                return False
+        elif gen not in self.record_gens:
+            return False
+
+        # Size of the file: positions + .npy header. A gen that is recorded again replaces its old file.
+        size = steps * population * 2 * np.dtype(np.uint8 if world_size <= 256 else np.uint16).itemsize + 128
+        old_size = self.index[gen]["size"] if gen in self.index else 0
+        if self.used_bytes - old_size + size > self.budget:
+            if self.budget_warned == False:
+                print(f"\033[33mSTEP RECORDING BUDGET ({self.budget} bytes) IS FULL, GENS FROM GEN {gen} ARE NOT RECORDED\033[0m")
+                self.budget_warned = True
+            return False
+        return True
+
+    def create(self, gen : int, world_size : int, population : int, steps : int):
+        """Returns a new memory-mapped StepRecording for the gen. Call add when the gen has been run."""
+        os.makedirs(self.path, exist_ok=True)
+        return StepRecording(world_size, population, steps, self.get_filepath(gen))
+
+    def add(self, gen : int, recording : StepRecording):
+        """Writes the gen's recording to the disk and lists it in the index."""
+        recording.flush()
+        self.index[gen] = {
+            "world_size": recording.world_size,
+            "population": recording.population,
+            "steps": len(recording),
+            "size": os.path.getsize(self.get_filepath(gen))
+        }
+        self.save_index()
+
+    def truncate(self, gen_count : int):
+        """Removes recordings of gens from gen_count onwards (gens that are cut out of the lab)."""
+        removed_gens = [gen for gen in self.index if gen >= gen_count]
+        if len(removed_gens) == 0:
+            return
+        for gen in removed_gens:
+            del self.index[gen]
+            if os.path.isfile(self.get_filepath(gen)):
+                os.remove(self.get_filepath(gen))
+        self.save_index()
+
+    def save_index(self):
+        temp_filepath = self.index_filepath + ".tmp"
+        with open(temp_filepath, "w") as file:
+            file.write(json.dumps({str(gen): self.index[gen] for gen in self.gens}, indent=4))
+        os.replace(temp_filepath, self.index_filepath)
+
+    def load(self, gen : int):
+        """Opens the gen's recording lazily (memory-mapped)."""
+        if gen not in self.index:
+            raise KeyError(f"gen {gen} has not been recorded")
+        return StepRecording.open(self.get_filepath(gen), self.index[gen]["world_size"])
@@ -0,0 +1,83 @@
+import numpy as np
+
+# SELECTION CRITERIA
+# A criterion is one of:
+#   {"name": name, "operator": "=" / "<" / ">", "value": value}     Compares the creatures' data[name] with value.
+#   {"name": name, "operator": "range", "value": (min, max)}        min <= data[name] < max.
+#   {"operator": "rect", "value": (x_min, y_min, x_max, y_max)}     Position inside the rectangle, max values excluded (like spawn_region).
+#   {"operator": "circle", "value": (x, y, radius)}                 Position at most radius away from (x, y).
+#   {"all": [criteria]} / {"any": [criteria]}                       Creatures that match all (AND) / any (OR) of the criteria.
+# A list of criteria is the same as {"all": list}.
+
+class Selection:
+    def __init__(self, selection_criteria : list):
+        """
+        Selection criteria compiled into one predicate over the population arrays, so selecting the survivors is a few array
+        operations instead of a Python loop over the creatures and the criteria. Compile once and reuse it for every gen.
+        Raises a ValueError if a criterion isn't valid (see the SELECTION CRITERIA comment).
+
+        Parameters
+        ----------
+            selection_criteria (list): Criteria that survivors match (all of them). A single criterion (dict) works too.
+        """
+
+        self.selection_criteria = selection_criteria
+        self.names = set() # Data names the criteria read, besides the position.
+        self.predicate = self.compile({"all": selection_criteria} if isinstance(selection_criteria, list) else selection_criteria)
+
+
+    def compile(self, criterion : dict):
+        """Returns the criterion as a function from the population's data ({name: array}) to a boolean mask of the matching creatures."""
+        if "all" in criterion or "any" in criterion:
+            combine = np.logical_and if "all" in criterion else np.logical_or
+            predicates = [self.compile(sub_criterion) for sub_criterion in criterion["all" if "all" in criterion else "any"]]
+            if len(predicates) == 0:
+                # Nothing to match: all() of nothing is True, any() of nothing is False.
+                return lambda data: np.full(len(data["id"]), combine is np.logical_and)
+            def combined(data):
+                mask = predicates[0](data)
+                for predicate in predicates[1:]:
+                    mask = combine(mask, predicate(data))
+                return mask
+            return combined
+
+        operator = criterion.get("operator")
+        value = criterion.get("value")
+
+        # Zones of the position
+        if operator == "rect":
+            x_min, y_min, x_max, y_max = value
+            return lambda data: (data["x"] >= x_min) & (data["x"] < x_max) & (data["y"] >= y_min) & (data["y"] < y_max)
+        if operator == "circle":
+            center_x, center_y, radius = value
+            return lambda data: (data["x"] - center_x) ** 2 + (data["y"] - center_y) ** 2 <= radius ** 2
+
+        # Comparisons of a data name
+        if not "name" in criterion:
+            raise ValueError(f"criterion {criterion} needs a 'name', or 'all' / 'any' criteria")
+        name = criterion["name"]
+        if not name in ("id", "x", "y"):
+            self.names.add(name)
+
+        if operator == "=":
+            return lambda data: data[name] == value
+        if operator == "<":
+            return lambda data: data[name] < value
+        if operator == ">":
+            return lambda data: data[name] > value
+        if operator == "range":
+            min_value, max_value = value
+            return lambda data: (data[name] >= min_value) & (data[name] < max_value)
+        raise ValueError(f"criterion {criterion} has an unknown operator '{operator}', use '=', '<', '>', 'range', 'rect' or 'circle'")
+
+    def get_mask(self, generation):
+        """Returns a boolean mask of the generation's creatures that match the criteria."""
+        data = generation.get_batch_data(np.arange(len(generation.x)))
+        # Names that aren't population arrays are gathered once from the creatures' data.
+        for name in self.names:
+            data[name] = np.array([creature.data[name] for creature in generation.creatures])
+        return np.asarray(self.predicate(data), dtype=bool)
+
+    def get_indices(self, generation):
+        """Returns the indices of the generation's creatures that match the criteria (survivors), in order."""
+        return np.flatnonzero(self.get_mask(generation))
@@ -0,0 +1,44 @@
+import numpy as np
+from lab.bytedna import batched
+
+# NEIGHBORHOOD SENSORS
+# Batched input neuron functions that see other creatures. They count creatures from the generation's summed-area table
+# (see Generation.get_occupancy_sat), so every creature's value is O(1) and a step stays O(population).
+
+SENSE_RADIUS = 2 # The sensors see a (2 * SENSE_RADIUS + 1)² square around the creature.
+
+@batched
+def localDensity(activation : np.ndarray, data : dict, generation):
+    """Share of the cells around the creature that have a creature (0 - 1). Cells outside the map aren't counted."""
+    x, y = data["x"], data["y"]
+    x_min, y_min = np.maximum(x - SENSE_RADIUS, 0), np.maximum(y - SENSE_RADIUS, 0)
+    x_max, y_max = np.minimum(x + SENSE_RADIUS + 1, generation.world_size), np.minimum(y + SENSE_RADIUS + 1, generation.world_size)
+    others = generation.count_in_rect(x_min, y_min, x_max, y_max) - 1
+    cells = (x_max - x_min) * (y_max - y_min) - 1
+    return others / np.maximum(cells, 1)
+
+@batched
+def neighborsX(activation : np.ndarray, data : dict, generation):
+    """Direction of the creatures around the creature in x (-1 = all are at smaller x, 1 = all are at bigger x, 0 = balanced or none)."""
+    x, y = data["x"], data["y"]
+    smaller = generation.count_in_rect(x - SENSE_RADIUS, y - SENSE_RADIUS, x, y + SENSE_RADIUS + 1)
+    bigger = generation.count_in_rect(x + 1, y - SENSE_RADIUS, x + SENSE_RADIUS + 1, y + SENSE_RADIUS + 1)
+    return (bigger - smaller) / np.maximum(bigger + smaller, 1)
+
+@batched
+def neighborsY(activation : np.ndarray, data : dict, generation):
+    """Direction of the creatures around the creature in y (-1 = all are at smaller y, 1 = all are at bigger y, 0 = balanced or none)."""
+    x, y = data["x"], data["y"]
+    smaller = generation.count_in_rect(x - SENSE_RADIUS, y - SENSE_RADIUS, x + SENSE_RADIUS + 1, y)
+    bigger = generation.count_in_rect(x - SENSE_RADIUS, y + 1, x + SENSE_RADIUS + 1, y + SENSE_RADIUS + 1)
+    return (bigger - smaller) / np.maximum(bigger + smaller, 1)
+
+@batched
+def blockedAhead(activation : np.ndarray, data : dict, generation):
+    """1 if the cell in the direction of the creature's latest move is a wall or has a creature, else 0 (also if it hasn't moved)."""
+    ids = data["id"]
+    heading_x, heading_y = generation.heading_x[ids], generation.heading_y[ids]
+    ahead_x, ahead_y = data["x"] + heading_x, data["y"] + heading_y
+    in_bounds = (ahead_x >= 0) & (ahead_x < generation.world_size) & (ahead_y >= 0) & (ahead_y < generation.world_size)
+    blocked = ~in_bounds | (generation.creature_at(ahead_x, ahead_y) >= 0)
+    return (blocked & ((heading_x != 0) | (heading_y != 0))).astype(np.float64)
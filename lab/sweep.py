@@ -0,0 +1,155 @@
+import os
+import csv
+import copy
+import json
+import time
+import itertools
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from lab.bytedna import ByteDNA
+from lab.lab import Lab
+
+def sweep_grid(base : dict, grid : dict):
+    """
+    Creates a config for every combination of the grid's values.
+
+    Parameters
+    ----------
+        base (dict): Base config (see run_sweep).
+        grid (dict): Dotted config keys and their values, like {"bytedna.genome_len": [4, 12], "lab.population": [64, 128]}.
+
+    Returns
+    -------
+        configs (list): Configs named by their grid values.
+    """
+
+    configs = []
+    keys = list(grid.keys())
+    for values in itertools.product(*[grid[key] for key in keys]):
+        config = copy.deepcopy(base)
+        name_parts = []
+        for key, value in zip(keys, values):
+            target = config
+            parts = key.split(".")
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+            name_parts.append(f"{parts[-1]}={value}")
+        config["name"] = "_".join([base.get("name", "config")] + name_parts)
+        configs.append(config)
+    return configs
+
+def get_config_params(config : dict):
+    """Returns the config's parameters as a flat dictionary (neuron functions and selection criteria are left out)."""
+    params = {"name": config["name"], "generations": config["generations"]}
+    for key, value in config.get("bytedna", {}).items():
+        if key not in ("inputs", "outputs"):
+            params[f"bytedna.{key}"] = value
+    for key, value in config.get("lab", {}).items():
+        params[f"lab.{key}"] = value
+    return params
+
+def sweep_worker(config : dict, path : str, queue):
+    """Runs a single config's Lab until it has all of its generations, and returns the config's summary row."""
+
+    bytedna = ByteDNA(**config["bytedna"])
+    lab = Lab(bytedna, config["selection_criteria"], name=config["name"], path=path, seed=config.get("seed"), **config.get("lab", {}))
+
+    # Run the remaining generations (a Lab continues from its save)
+    while lab.gen + 1 < config["generations"]:
+        lab.run_generation()
+        queue.put((config["name"], lab.gen, lab.last_gen_stats))
+    lab.save_gens()
+
+    # Summary of the config, from all of the lab's gens (also the ones run before a resume)
+    columns = lab.load_stats_columns()
+    survived = columns["survived"]
+    diversity = columns["diversity"][~np.isnan(columns["diversity"])]
+    last_tenth = survived[-max(1, len(survived) // 10):]
+    summary = get_config_params(config)
+    summary.update({
+        "final_gen": lab.gen,
+        "final_survived": int(survived[-1]) if len(survived) > 0 else None,
+        "mean_survived_last_10pct": float(np.mean(last_tenth)) if len(survived) > 0 else None,
+        "final_diversity": float(diversity[-1]) if len(diversity) > 0 else None
+    })
+
+    # Mark the config finished, so a resumed sweep skips it.
+    with open(os.path.join(lab.path, "sweep_done.json"), "w") as file:
+        file.write(json.dumps(summary, indent=4))
+
+    return summary
+
+def run_sweep(configs : list, name : str = "sweep", processes : int = os.cpu_count(), on_stats = None,
+              path : str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "saves")):
+    """
+    Runs every config as an independent Lab in a process pool, and writes the summaries into saves/<name>/summary.csv.
+    Finished configs are skipped, so an interrupted sweep can be run again to continue it.
+
+    Config keys
+    -----------
+    - name (str): Lab name of the config, saved into saves/<name>/<config name>.
+    - bytedna (dict): ByteDNA arguments (inputs, outputs, genome_len...). Neuron functions must be picklable (module level functions).
+    - lab (dict): Other Lab arguments (world_size, population...).
+    - selection_criteria (list): Lab's selection criteria.
+    - generations (int): Total generations of the config.
+    - seed (int): Optional lab seed of the config.
+
+    Parameters
+    ----------
+        configs (list): Configs to run (see sweep_grid).
+        name (str): Name of the sweep.
+        processes (int): Count of worker processes.
+        on_stats (function): Called with (config name, gen, gen stats) after every generation. None = prints a progress line every 100 gens.
+
+    Returns
+    -------
+        summaries (list): Summary rows of all configs.
+    """
+
+    sweep_path = os.path.join(path, name)
+    os.makedirs(sweep_path, exist_ok=True)
+    start_time = time.time()
+
+    # Skip finished configs
+    summaries = {}
+    pending_configs = []
+    for config in configs:
+        done_filepath = os.path.join(sweep_path, config["name"], "sweep_done.json")
+        if os.path.isfile(done_filepath):
+            with open(done_filepath, "r") as file:
+                summaries[config["name"]] = json.loads(file.read())
+        else:
+            pending_configs.append(config)
+    print(f"sweep '{name}': {len(pending_configs)} configs to run, {len(summaries)} finished")
+
+    # Run the pending configs, and stream their stats back through a queue.
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=processes) as executor:
+        queue = manager.Queue()
+        futures = [executor.submit(sweep_worker, config, sweep_path, queue) for config in pending_configs]
+        not_done = set(futures)
+        while len(not_done) > 0:
+            done, not_done = wait(not_done, timeout=0.5, return_when=FIRST_COMPLETED)
+            while not queue.empty():
+                config_name, gen, gen_stats = queue.get()
+                if on_stats != None:
+                    on_stats(config_name, gen, gen_stats)
+                elif gen % 100 == 0:
+                    print(f"[{int(time.time() - start_time)}s / {config_name} / gen {gen}] survived = {gen_stats['survived']}")
+            for future in done:
+                summary = future.result()
+                summaries[summary["name"]] = summary
+                print(f"[{int(time.time() - start_time)}s] finished {summary['name']}")
+
+    # Write the summary table in the configs' order
+    rows = [summaries[config["name"]] for config in configs]
+    columns = []
+    for row in rows:
+        columns.extend([key for key in row.keys() if key not in columns])
+    with open(os.path.join(sweep_path, "summary.csv"), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return rows
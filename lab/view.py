@@ -1,10 +1,24 @@
 from tkinter import *
 import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1 import host_subplot
+import os
+import json
 import time
+import numpy as np
+from lab.archive import StatsLog
 
-def view_generation(steps_data):
-    """Opens a window that shows the generation frame by frame. (It draws the map and creatures)"""
+def view_generation(steps_data, fps : float = 10):
+    """
+    Opens a window that shows the generation frame by frame. (It draws the map and creatures)
+    Only occupied cells are drawn, and between frames only the cells that changed are redrawn.
+
+    Controls: Play/Pause (space), seek bar, previous/next frame (left/right arrow) and FPS.
+
+    Parameters
+    ----------
+        steps_data (StepRecording): Recorded steps of the generation. A list of {"map": map} steps works too.
+        fps (float): Target frames per second when playing.
+    """
 
     # SETUP
 
@@ -18,15 +32,27 @@ def view_generation(steps_data):
     canvas = Canvas(root, bg="black", width=1920, height=1080, highlightthickness=0)
     canvas.place(x=0, y=0)
 
+    steps_count = len(steps_data)
+    world_size = len(steps_data[0]["map"])
+
     step_label = Label(root, width=10, height=1, text="step 0", fg="white", bg="black")
     step_label.pack(side=TOP, anchor="e", padx=10, pady=10)
 
+    play_button = Button(root, width=8, height=2, text="Pause")
+    play_button.pack(side=TOP, anchor="e", padx=10, pady=10)
+
+    seek_scale = Scale(root, from_=0, to=steps_count - 1, orient=HORIZONTAL, length=200, showvalue=False, label="step", fg="white", bg="black", highlightthickness=0)
+    seek_scale.pack(side=TOP, anchor="e", padx=10, pady=10)
+
+    fps_scale = Scale(root, from_=1, to=60, orient=HORIZONTAL, length=200, label="fps", fg="white", bg="black", highlightthickness=0)
+    fps_scale.set(fps)
+    fps_scale.pack(side=TOP, anchor="e", padx=10, pady=10)
+
     exit_button = Button(root, width=8, height=2, text="Exit", command=root.destroy)
     exit_button.pack(side=TOP, anchor="e", padx=10, pady=10)
 
     root.update()
 
-    world_size = len(steps_data[0]["map"])
     map_size = 700
     cell_size = map_size / world_size
     root_width = root.winfo_width()
@@ -35,47 +61,139 @@ def view_generation(steps_data):
     start_y = (root_height - map_size) * 0.5
 
     canvas.create_rectangle(start_x, start_y, root_width - start_x, root_height - start_y, fill="", outline="white", width=4)
-    canvas.update()
-    time.sleep(1)
 
 
     # DRAW FRAMES
 
-    for step in range(len(steps_data)):
-        step_data = steps_data[step]
-        step_map = step_data["map"]
+    state = {
+        "step": -1, # Shown step
+        "map": np.zeros(shape=(world_size, world_size), dtype=np.int8), # Shown map
+        "cells": {}, # Canvas items of the occupied cells: {(x, y): item}
+        "playing": True,
+        "timer": None
+    }
 
-        try:
-            canvas.delete("cell")
-            step_label.config(text=f"step {step}")
-        except:
-            break
-
-        for y in range(world_size):
-            for x in range(world_size):
-                # Choose color for the pixel
-                color = "black"
-                if step_map[x][y] == 1:
-                    color = "lime"
-
-                # Draws the pixel
+    def show_step(step : int):
+        # Redraws only the cells that differ from the shown map.
+        step_map = np.asarray(steps_data[step]["map"])
+        cells = state["cells"]
+        for x, y in np.argwhere(step_map != state["map"]).tolist():
+            if step_map[x][y] != 0:
+                if (x, y) in cells:
+                    continue
                 x_pos = start_x + (x * cell_size)
                 y_pos = start_y + (y * cell_size)
-                canvas.create_rectangle(x_pos, y_pos, x_pos + cell_size, y_pos + cell_size, fill=color, width="0", tags="cell")
-        
-        canvas.update()
-        time.sleep(0.1) # < 10FPS
-    
-    try:
-        root.destroy()
-    except:
-        return
+                cells[(x, y)] = canvas.create_rectangle(x_pos, y_pos, x_pos + cell_size, y_pos + cell_size, fill="lime", width=0)
+            else:
+                canvas.delete(cells.pop((x, y)))
 
-def view_evolution_chart(gens_stats : list, population : int):
-    """Opens a window that shows the evolution chart."""
-    
-    survived_list = [gen_stats["survived"] for gen_stats in gens_stats]
-    diversity_list = [gen_stats["diversity"] for gen_stats in gens_stats]
+        state["map"] = step_map
+        state["step"] = step
+        step_label.config(text=f"step {step}")
+        if seek_scale.get() != step:
+            seek_scale.set(step)
+
+    def play_next():
+        # Shows the next frame and schedules the one after it, so the time to draw counts into the frame time.
+        frame_start_time = time.time()
+        state["timer"] = None
+        if state["playing"] == False:
+            return
+        if state["step"] + 1 >= steps_count:
+            set_playing(False)
+            return
+
+        show_step(state["step"] + 1)
+        frame_time = 1 / max(fps_scale.get(), 1)
+        delay = max(1, int((frame_time - (time.time() - frame_start_time)) * 1000))
+        state["timer"] = root.after(delay, play_next)
+
+    def set_playing(playing : bool):
+        state["playing"] = playing
+        play_button.config(text="Pause" if playing else "Play")
+        if state["timer"] != None:
+            root.after_cancel(state["timer"])
+            state["timer"] = None
+        if playing == True:
+            # Playing from the last frame starts from the beginning.
+            if state["step"] + 1 >= steps_count:
+                show_step(0)
+            state["timer"] = root.after(1, play_next)
+
+    def seek(value):
+        step = int(float(value))
+        if step != state["step"]:
+            show_step(step)
+
+    def step_by(change : int):
+        set_playing(False)
+        show_step(min(max(state["step"] + change, 0), steps_count - 1))
+
+    play_button.config(command=lambda: set_playing(not state["playing"]))
+    seek_scale.config(command=seek)
+    root.bind("<space>", lambda event: set_playing(not state["playing"]))
+    root.bind("<Left>", lambda event: step_by(-1))
+    root.bind("<Right>", lambda event: step_by(1))
+    root.bind("<Escape>", lambda event: root.destroy())
+
+    show_step(0)
+    state["timer"] = root.after(1000, play_next)
+    root.mainloop()
+
+def decimate_min_max(values : np.ndarray, start : int, stop : int, buckets : int):
+    """
+    Decimates values[start:stop] to the min and max value of every bucket (in gen order), so a chart of
+    millions of gens keeps its peaks but draws only about 2 points per bucket. NaN values (not calculated) are left out.
+
+    Returns
+    -------
+        gens (np.ndarray): Gens of the points.
+        values (np.ndarray): Values of the points.
+    """
+
+    values = values[start:stop]
+    if len(values) <= buckets * 2:
+        gens = np.arange(start, start + len(values))
+        not_nan = ~np.isnan(values)
+        return gens[not_nan], values[not_nan]
+
+    # Split the values into buckets (the last one is padded with NaN), and take the min and max of every bucket.
+    bucket_size = -(-len(values) // buckets)
+    buckets_count = -(-len(values) // bucket_size)
+    padded = np.full(buckets_count * bucket_size, np.nan)
+    padded[:len(values)] = values
+    padded = padded.reshape(buckets_count, bucket_size)
+    min_i = np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    max_i = np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+
+    bucket_starts = np.arange(buckets_count) * bucket_size
+    indexes = np.stack([bucket_starts + np.minimum(min_i, max_i), bucket_starts + np.maximum(min_i, max_i)], axis=1).ravel()
+    points = padded.ravel()[indexes]
+    not_nan = ~np.isnan(points)
+    return start + indexes[not_nan], points[not_nan]
+
+def view_evolution_chart(gens_stats, population : int, refresh_interval : float = 0):
+    """
+    Opens a window that shows the evolution chart.
+    The lines are decimated to the chart's width in pixels (see decimate_min_max), and zooming or panning decimates the visible gens again.
+
+    Parameters
+    ----------
+        gens_stats (list or function): Gens' stats, or a function that returns the stats of the gens from a start gen as columns
+                                       (like Lab.load_stats_columns or StatsLog.read_columns).
+        population (int): Lab's population (top of the survived axis).
+        refresh_interval (float): Seconds between reading new gens from the function. 0 = no refreshing.
+    """
+
+    # Stats as columns. A function is called again with the count of gens already read, so a refresh reads only the new gens.
+    if callable(gens_stats):
+        get_columns = gens_stats
+    else:
+        get_columns = lambda start: {
+            "survived": np.array([gen_stats["survived"] for gen_stats in gens_stats[start:]], dtype=np.float64),
+            "diversity": np.array([gen_stats["diversity"] if gen_stats["diversity"] != None else np.nan for gen_stats in gens_stats[start:]], dtype=np.float64) # None = not calculated
+        }
+    columns = get_columns(0)
 
     host = host_subplot(111)
     par = host.twinx()
@@ -84,9 +202,10 @@ def view_evolution_chart(gens_stats : list, population : int):
     host.set_ylabel("Survived")
     par.set_ylabel("Diversity")
 
-    p1, = host.plot(survived_list, label="Survived")
-    p2, = par.plot(diversity_list, label="Diversity")
+    p1, = host.plot([], [], label="Survived")
+    p2, = par.plot([], [], label="Diversity")
     
+    host.set_xlim((0, max(len(columns["survived"]) - 1, 1)))
     host.set_ylim((0, population + 1))
     par.set_ylim((0, 1.01))
 
@@ -94,4 +213,45 @@ def view_evolution_chart(gens_stats : list, population : int):
     host.yaxis.get_label().set_color(p1.get_color())
     par.yaxis.get_label().set_color(p2.get_color())
 
-    plt.show()
\ No newline at end of file
+    def redraw():
+        # Decimate only the visible gens, about one min and max per pixel.
+        x_min, x_max = host.get_xlim()
+        start = max(int(np.floor(x_min)), 0)
+        stop = max(int(np.ceil(x_max)) + 1, start)
+        buckets = max(int(host.bbox.width), 1)
+        p1.set_data(*decimate_min_max(columns["survived"], start, stop, buckets))
+        p2.set_data(*decimate_min_max(columns["diversity"], start, stop, buckets))
+        host.figure.canvas.draw_idle()
+
+    def refresh():
+        new_columns = get_columns(len(columns["survived"]))
+        if len(new_columns["survived"]) == 0:
+            return
+
+        # If the chart shows the latest gen, it keeps following the new gens.
+        following = host.get_xlim()[1] >= len(columns["survived"]) - 1
+        for column in columns:
+            columns[column] = np.concatenate([columns[column], new_columns[column]])
+        if following == True:
+            host.set_xlim((host.get_xlim()[0], max(len(columns["survived"]) - 1, 1)))
+        else:
+            redraw()
+
+    host.callbacks.connect("xlim_changed", lambda axes: redraw())
+    if refresh_interval > 0:
+        timer = host.figure.canvas.new_timer(interval=int(refresh_interval * 1000))
+        timer.add_callback(refresh)
+        timer.start()
+
+    redraw()
+    plt.show()
+
+def view_lab_chart(lab_path : str, refresh_interval : float = 5):
+    """
+    Opens the evolution chart of a lab's save, like a lab that is being run in another process. Gens are shown when they are saved.
+    Reads only the stats' columns file, which is created when the lab is loaded.
+    """
+    with open(os.path.join(lab_path, "properties.json"), "r") as file:
+        population = json.loads(file.read())["population"]
+    stats_log = StatsLog(os.path.join(lab_path, "stats.jsonl"))
+    view_evolution_chart(stats_log.read_columns, population, refresh_interval)
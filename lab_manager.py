@@ -3,6 +3,7 @@ import json
 from lab.lab import Lab
 from lab.bytedna import ByteDNA
 import lab.view as view
+import lab.export as export
 
 
 # Add color codes to a string
@@ -60,10 +61,16 @@ def open_lab_manager(_lab : Lab, _bytedna : ByteDNA):
                 cmd_run_generation()
             case "run_generations":
                 cmd_run_generations()
+            case "replay_generation":
+                cmd_replay_generation()
             case "view_generation":
                 cmd_view_generation()
+            case "view_recording":
+                cmd_view_recording()
             case "view_chart":
                 cmd_view_chart()
+            case "export_generations":
+                cmd_export_generations()
 
 def load_manager_settings():
     if os.path.isfile(path) == False:
@@ -88,8 +95,11 @@ use_colors = enable/disable colors in console. some consoles don't support color
 gen = prints the latest lab generation number
 run_generation = runs a single generation
 run_generations = runs multiple generations
-view_generation = visualizes lastly saved generation by frame (run_generation + save_steps = Yes)
-view_chart = visualizes the entire evolution on a chart"""
+replay_generation = runs an old generation again exactly like it was run, and saves its steps
+view_generation = visualizes lastly saved generation by frame (run_generation + save_steps = Yes, or replay_generation)
+view_recording = visualizes a generation recorded to the disk (lab's record_gens)
+view_chart = visualizes the entire evolution on a chart
+export_generations = exports generations as GIFs or PNG frames into the lab's 'exports' directory (no display needed)"""
 def cmd_help():
     print(colorstr(help_text, "magenta"))
 
@@ -110,9 +120,7 @@ def cmd_run_generation():
                 # If answer was an int and lab has processed that gen before, it uses that gen's genomes.
                 run_gen_num = int(run_gen_num)
                 if run_gen_num <= lab.gen:
-                    all_genomes, stats = lab.load_gens()
-                    genomes_bytes = lab.bytedna.gene_bytes * lab.bytedna.genome_len * lab.population
-                    genomes = all_genomes[run_gen_num * genomes_bytes : run_gen_num * genomes_bytes + genomes_bytes]
+                    genomes = lab.load_gen(run_gen_num)
                 
                 else:
                     print(colorstr("gen num was above the newest gen, so using newest genomes", "red"))
@@ -136,18 +144,70 @@ def cmd_run_generations():
     except:
         print(colorstr("count was not a valid integer", "red"))
 
+def cmd_replay_generation():
+    global lab, bytedna, saved_steps
+
+    try:
+        gen = int(inp("gen (int): "))
+        if gen < 0 or gen > lab.gen:
+            print(colorstr(f"gen must be between 0 and {lab.gen}", "red"))
+            return
+    except:
+        print(colorstr("gen was not a valid integer", "red"))
+        return
+
+    try:
+        saved_steps = lab.replay_generation(gen)
+    except ValueError as error:
+        print(colorstr(str(error), "red"))
+        return
+    print(colorstr(f"finished, steps of gen {gen} saved", "green"))
+
 def cmd_view_generation():
     global lab, bytedna, saved_steps
     if saved_steps != None:
         view.view_generation(saved_steps)
     else: print(colorstr("no saved steps - first run a generation with 'save_steps' enabled.", "red"))
 
+def cmd_view_recording():
+    global lab, bytedna, saved_steps
+    if len(lab.recorder.gens) == 0:
+        print(colorstr("no recorded gens - set the lab's 'record_gens' to record gens.", "red"))
+        return
+
+    try:
+        gen = int(inp(f"gen (int, recorded gens: {lab.recorder.gens[0]} - {lab.recorder.gens[-1]}): "))
+        view.view_generation(lab.load_recording(gen))
+    except ValueError:
+        print(colorstr("gen was not a valid integer", "red"))
+    except KeyError:
+        print(colorstr("gen has not been recorded", "red"))
+
 def cmd_view_chart():
-    genomes, stats = lab.load_gens()
-    view.view_evolution_chart(stats, lab.population)
+    view.view_evolution_chart(lab.load_stats_columns, lab.population)
 
 def cmd_use_colors():
     global settings
     settings["use_colors"] = inp("use colors in console (yes/no): ") == "yes"
     save_manager_settings()
     print(colorstr("lab settings updated and saved", "green"))
+
+def cmd_export_generations():
+    global lab, bytedna, saved_steps
+
+    try:
+        gens = [int(gen) for gen in inp("gens (ints separated by spaces): ").split()]
+    except:
+        print(colorstr("gens were not valid integers", "red"))
+        return
+    if len(gens) == 0 or min(gens) < 0 or max(gens) > lab.gen:
+        print(colorstr(f"gens must be between 0 and {lab.gen}", "red"))
+        return
+    format = "png" if inp("format (gif/png): ") == "png" else "gif"
+
+    try:
+        filepaths = export.export_generations(lab, gens, format=format)
+    except ValueError as error:
+        print(colorstr(str(error), "red"))
+        return
+    print(colorstr(f"finished, exported into {os.path.dirname(filepaths[0])}", "green"))
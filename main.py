@@ -1,43 +1,45 @@
 from lab.lab import Lab
-from lab.bytedna import ByteDNA
+from lab.bytedna import ByteDNA, batched
 from lab.generation import Generation
 import lab.view as view
 import lab_manager
+import numpy as np
 
 
 # NEURON FUNCTIONS
+# These are batched, so they get data of the whole population as arrays. (data["id"], data["x"], data["y"])
 
 # Input
-def disUP(activation : float, data : dict, generation : Generation):
+@batched
+def disUP(activation : np.ndarray, data : dict, generation : Generation):
     return data["y"] / (generation.world_size - 1)
-def disDOWN(activation : float, data : dict, generation : Generation):
+@batched
+def disDOWN(activation : np.ndarray, data : dict, generation : Generation):
     return (generation.world_size - 1 - data["y"]) / (generation.world_size - 1)
-def disRIGHT(activation : float, data : dict, generation : Generation):
+@batched
+def disRIGHT(activation : np.ndarray, data : dict, generation : Generation):
     return data["x"] / (generation.world_size - 1)
-def disLEFT(activation : float, data : dict, generation : Generation):
+@batched
+def disLEFT(activation : np.ndarray, data : dict, generation : Generation):
     return (generation.world_size - 1 - data["x"]) / (generation.world_size - 1)
 
 # Output
-def moveUP(activation : float, data : dict, generation : Generation):
-    if activation > 0:
-        moved = generation.change_pos(data["x"], data["y"], 0, -1)
-        if moved: data["y"] -= 1
-    return 0
-def moveDOWN(activation : float, data : dict, generation : Generation):
-    if activation > 0:
-        moved = generation.change_pos(data["x"], data["y"], 0, 1)
-        if moved: data["y"] += 1
-    return 0
-def moveRIGHT(activation : float, data : dict, generation : Generation):
-    if activation > 0:
-        moved = generation.change_pos(data["x"], data["y"], -1, 0)
-        if moved: data["x"] -= 1
-    return 0
-def moveLEFT(activation : float, data : dict, generation : Generation):
-    if activation > 0:
-        moved = generation.change_pos(data["x"], data["y"], 1, 0)
-        if moved: data["x"] += 1
-    return 0
+@batched
+def moveUP(activation : np.ndarray, data : dict, generation : Generation):
+    generation.queue_moves(data["id"][activation > 0], 0, -1)
+    return np.zeros(len(activation))
+@batched
+def moveDOWN(activation : np.ndarray, data : dict, generation : Generation):
+    generation.queue_moves(data["id"][activation > 0], 0, 1)
+    return np.zeros(len(activation))
+@batched
+def moveRIGHT(activation : np.ndarray, data : dict, generation : Generation):
+    generation.queue_moves(data["id"][activation > 0], -1, 0)
+    return np.zeros(len(activation))
+@batched
+def moveLEFT(activation : np.ndarray, data : dict, generation : Generation):
+    generation.queue_moves(data["id"][activation > 0], 1, 0)
+    return np.zeros(len(activation))
 
 # CREATE DNA WITH THESE FUNCTIONS
 input_funcs = [disUP, disDOWN, disRIGHT, disLEFT]
@@ -52,9 +54,11 @@ selection_criteria = [
     "value": 16
 }]
 
-# CREATE THE LAB INSTANCE
-lab = Lab(bytedna, selection_criteria, name="left_test", steps_per_gen=64, population=128, world_size=32)
+# Only when main.py is run. Worker processes (like the exports') import this file again to get the neuron functions.
+if __name__ == "__main__":
+    # CREATE THE LAB INSTANCE
+    lab = Lab(bytedna, selection_criteria, name="left_test", steps_per_gen=64, population=128, world_size=32)
 
 
-# OPEN LAB MANAGER
-lab_manager.open_lab_manager(lab, bytedna)
\ No newline at end of file
+    # OPEN LAB MANAGER
+    lab_manager.open_lab_manager(lab, bytedna)
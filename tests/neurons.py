@@ -0,0 +1,42 @@
+import numpy as np
+from lab.bytedna import ByteDNA, batched
+
+# NEURON FUNCTIONS OF THE TESTS
+# Batched functions like in main.py, and a normal (per creature) input and output to test the adapters.
+
+# Input
+@batched
+def disX(activation : np.ndarray, data : dict, generation):
+    return data["x"] / (generation.world_size - 1)
+@batched
+def disY(activation : np.ndarray, data : dict, generation):
+    return data["y"] / (generation.world_size - 1)
+def parity(activation : float, data : dict, generation):
+    return (data["x"] + data["y"]) % 2
+
+# Output
+@batched
+def moveUP(activation : np.ndarray, data : dict, generation):
+    generation.queue_moves(data["id"][activation > 0], 0, -1)
+    return np.zeros(len(activation))
+@batched
+def moveDOWN(activation : np.ndarray, data : dict, generation):
+    generation.queue_moves(data["id"][activation > 0], 0, 1)
+    return np.zeros(len(activation))
+@batched
+def moveRIGHT(activation : np.ndarray, data : dict, generation):
+    generation.queue_moves(data["id"][activation > 0], 1, 0)
+    return np.zeros(len(activation))
+@batched
+def moveLEFT(activation : np.ndarray, data : dict, generation):
+    generation.queue_moves(data["id"][activation > 0], -1, 0)
+    return np.zeros(len(activation))
+def halve(activation : float, data : dict, generation):
+    return activation * 0.5
+
+INPUTS = [disX, disY, parity]
+OUTPUTS = [moveUP, moveDOWN, moveRIGHT, moveLEFT, halve]
+
+def new_bytedna(inputs : list = INPUTS, outputs : list = OUTPUTS, genome_len : int = 8, seed : int = 0, **kwargs):
+    """Returns a ByteDNA of the test neurons (3 gene bytes, 3 inner neurons)."""
+    return ByteDNA(inputs, outputs, genome_len, 3, 3, 100, 5, 5, 12, seed=seed, **kwargs)
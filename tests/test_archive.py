@@ -0,0 +1,91 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+from lab.archive import GenomeArchive, CompressedGenomeArchive
+
+POPULATION = 16
+GENOME_LEN = 4
+GENE_BYTES = 3
+
+def evolving_gens(count : int, seed : int):
+    """Returns count gens where every gen is the previous gen with a few changed bytes (like mutations), as a (gens, gen bytes) array."""
+    rng = np.random.default_rng(seed)
+    gen_bytes = POPULATION * GENOME_LEN * GENE_BYTES
+    gens = np.empty((count, gen_bytes), dtype=np.uint8)
+    gen = rng.integers(0, 256, size=gen_bytes, dtype=np.uint8)
+    for i in range(count):
+        changed = rng.choice(gen_bytes, size=5, replace=False)
+        gen[changed] = rng.integers(0, 256, size=5, dtype=np.uint8)
+        gens[i] = gen
+    return gens
+
+class CompressedGenomeArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def open_archive(self, compression : str):
+        archive = CompressedGenomeArchive(os.path.join(self.path, f"genomes_{compression}"), POPULATION, GENOME_LEN, GENE_BYTES, compression)
+        self.addCleanup(archive.close)
+        return archive
+
+    def open_raw_archive(self):
+        archive = GenomeArchive(os.path.join(self.path, "genomes.bin"), POPULATION, GENOME_LEN, GENE_BYTES)
+        self.addCleanup(archive.close)
+        return archive
+
+    def assert_same_gens(self, archive, expected : np.ndarray):
+        self.assertEqual(archive.gen_count, len(expected))
+        expected = expected.reshape(len(expected), POPULATION, -1)
+        np.testing.assert_array_equal(archive.get_gens(0, len(expected)), expected)
+        for gen in range(len(expected)):
+            np.testing.assert_array_equal(archive.get_gen(gen), expected[gen])
+        np.testing.assert_array_equal(archive.get_gen(-1), expected[-1])
+        np.testing.assert_array_equal(archive.get_gens(3, len(expected) - 2), expected[3 : len(expected) - 2]) # Across chunks
+
+    def test_round_trip(self):
+        # Gens read back (also after reopening) are the same as the raw archive's, with both compressions.
+        gens = evolving_gens(40, 0)
+        raw_archive = self.open_raw_archive()
+        raw_archive.append(gens.tobytes())
+        for compression in CompressedGenomeArchive.COMPRESSIONS:
+            archive = self.open_archive(compression)
+            for start in range(0, len(gens), 7):
+                archive.append(gens[start : start + 7].tobytes())
+            self.assert_same_gens(archive, gens)
+            self.assert_same_gens(self.open_archive(compression), gens)
+            np.testing.assert_array_equal(archive.get_gens(0, len(gens)), raw_archive.get_gens(0, len(gens)))
+            self.assertLess(archive.file_size, raw_archive.file_size)
+
+    def test_truncate(self):
+        # Truncating in the middle of a chunk keeps the gens before it, and the archive can be appended to again.
+        gens = evolving_gens(30, 1)
+        for compression in CompressedGenomeArchive.COMPRESSIONS:
+            archive = self.open_archive(compression)
+            for start in range(0, 20, 10):
+                archive.append(gens[start : start + 10].tobytes())
+            archive.truncate(13)
+            self.assert_same_gens(archive, gens[:13])
+            archive.append(gens[13:30].tobytes())
+            self.assert_same_gens(self.open_archive(compression), gens)
+
+    def test_interrupted_append(self):
+        # Bytes of a chunk without an index record (a crash during an append) are ignored and cut out.
+        gens = evolving_gens(12, 2)
+        archive = self.open_archive("zlib")
+        archive.append(gens[:8].tobytes())
+        with open(archive.data_filepath, "ab") as file:
+            file.write(b"unfinished chunk")
+
+        archive = self.open_archive("zlib")
+        self.assert_same_gens(archive, gens[:8])
+        archive.truncate(archive.gen_count)
+        archive.append(gens[8:].tobytes())
+        self.assert_same_gens(self.open_archive("zlib"), gens)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from lab.generation import Generation
+from lab.creature import Creature, CreatureData
+from lab.brain import PopulationBrain
+from tests.neurons import new_bytedna
+
+def spawn_creatures(generation : Generation):
+    """Spawns the generation's creatures like Generation.run, and returns them."""
+    genomes_list = generation.bytedna.get_separated_genomes(generation.genomes)
+    generation.spawn_population(len(genomes_list))
+    generation.creatures = []
+    for i, genome in enumerate(genomes_list):
+        data = CreatureData(generation, i, {"x": int(generation.x[i]), "y": int(generation.y[i])})
+        generation.creatures.append(Creature(data, genome, generation.bytedna, generation))
+    return generation.creatures
+
+class PopulationBrainTest(unittest.TestCase):
+    def new_generations(self, seed : int, population : int = 96):
+        """Returns two identical generations of random genomes."""
+        bytedna = new_bytedna(seed=seed)
+        genomes = bytedna.random_genomes(population)
+        return [Generation(genomes, bytedna, 24, population, 16, rng=np.random.default_rng(seed)) for i in range(2)]
+
+    def test_outputs_are_bitwise_identical(self):
+        # Every step's neuron outputs and positions must be the same as with one Creature.update at a time.
+        for seed in range(4):
+            brain_generation, creatures_generation = self.new_generations(seed)
+            brain = PopulationBrain(spawn_creatures(brain_generation), brain_generation.bytedna)
+            creatures = spawn_creatures(creatures_generation)
+
+            for step in range(brain_generation.steps_per_gen):
+                brain.update(brain_generation)
+                brain_generation.resolve_moves()
+                for creature in creatures:
+                    creature.update()
+                creatures_generation.resolve_moves()
+
+                creatures_output = np.array([output for creature in creatures for output in creature.neurons_output], dtype=np.float64)
+                self.assertEqual(brain.neurons_output.tobytes(), creatures_output.tobytes(), f"seed {seed}, step {step}")
+                np.testing.assert_array_equal(brain_generation.x, creatures_generation.x)
+                np.testing.assert_array_equal(brain_generation.y, creatures_generation.y)
+                np.testing.assert_array_equal(brain_generation.map, creatures_generation.map)
+
+    def test_generation_run_is_identical(self):
+        # Generation.run gives the same steps with and without the population brain.
+        brain_generation, creatures_generation = self.new_generations(7)
+        brain_generation.run(save_steps=True, population_brain=True)
+        creatures_generation.run(save_steps=True, population_brain=False)
+        for step in range(len(brain_generation.steps_data)):
+            np.testing.assert_array_equal(brain_generation.steps_data.get_positions(step), creatures_generation.steps_data.get_positions(step))
+
+if __name__ == "__main__":
+    unittest.main()
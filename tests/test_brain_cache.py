@@ -0,0 +1,62 @@
+import unittest
+from tests.neurons import new_bytedna
+
+class BrainCacheTest(unittest.TestCase):
+    def test_hits_and_misses(self):
+        # Identical genomes are compiled once and share the brain. A second pass over the same genomes only hits.
+        bytedna = new_bytedna()
+        genomes_list = bytedna.get_separated_genomes(bytedna.random_genomes(10))
+        genomes_list = genomes_list + genomes_list[:4]
+        brains = bytedna.compile_brains(genomes_list)
+        self.assertEqual((bytedna.brain_cache_misses, bytedna.brain_cache_hits), (10, 4))
+        for i in range(4):
+            self.assertIs(brains[10 + i], brains[i])
+
+        self.assertEqual(bytedna.compile_brains(genomes_list), brains)
+        self.assertEqual((bytedna.brain_cache_misses, bytedna.brain_cache_hits), (10, 18))
+        self.assertIs(bytedna.compile_brain(genomes_list[3]), brains[3])
+
+    def test_cached_brain_is_the_same_as_compiled(self):
+        cached_bytedna = new_bytedna()
+        uncached_bytedna = new_bytedna(brain_cache_size=0)
+        genomes_list = cached_bytedna.get_separated_genomes(cached_bytedna.random_genomes(20))
+        cached_bytedna.compile_brains(genomes_list)
+        for cached_brain, brain in zip(cached_bytedna.compile_brains(genomes_list), uncached_bytedna.compile_brains(genomes_list)):
+            self.assertIsNot(cached_brain, brain)
+            self.assertEqual(cached_brain.neurons_function, brain.neurons_function)
+            self.assertEqual((cached_brain.conns_source_id, cached_brain.conns_sink_id, cached_brain.conns_weight),
+                             (brain.conns_source_id, brain.conns_sink_id, brain.conns_weight))
+
+    def test_least_recently_used_is_evicted(self):
+        bytedna = new_bytedna(brain_cache_size=3)
+        a, b, c, d = bytedna.get_separated_genomes(bytedna.random_genomes(4))
+        bytedna.compile_brains([a, b, c])
+        bytedna.compile_brain(a) # a is now used more recently than b
+        bytedna.compile_brain(d) # b is evicted
+        self.assertEqual(list(bytedna.brain_cache.keys()), [bytes(c), bytes(a), bytes(d)])
+
+        misses = bytedna.brain_cache_misses
+        bytedna.compile_brain(b)
+        self.assertEqual(bytedna.brain_cache_misses, misses + 1)
+        self.assertNotIn(bytes(c), bytedna.brain_cache)
+
+    def test_disabled_cache(self):
+        bytedna = new_bytedna(brain_cache_size=0)
+        genomes_list = bytedna.get_separated_genomes(bytedna.random_genomes(5))
+        bytedna.compile_brains(genomes_list)
+        bytedna.compile_brains(genomes_list)
+        self.assertEqual(len(bytedna.brain_cache), 0)
+        self.assertEqual(bytedna.brain_cache_misses, 10)
+
+    def test_default_size_fits_the_population(self):
+        # A population bigger than DEFAULT_BRAIN_CACHE_SIZE stays cached, so the next pass doesn't miss every genome.
+        bytedna = new_bytedna(genome_len=4)
+        population = bytedna.DEFAULT_BRAIN_CACHE_SIZE + 500
+        genomes_list = bytedna.get_separated_genomes(bytedna.random_genomes(population))
+        bytedna.compile_brains(genomes_list)
+        misses = bytedna.brain_cache_misses
+        bytedna.compile_brains(genomes_list)
+        self.assertEqual(bytedna.brain_cache_misses, misses)
+
+if __name__ == "__main__":
+    unittest.main()
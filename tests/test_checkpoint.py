@@ -0,0 +1,129 @@
+import os
+import io
+import json
+import pickle
+import random
+import unittest
+import tempfile
+import contextlib
+import numpy as np
+from lab.lab import Lab
+from lab.checkpoint import save_checkpoint, load_checkpoint
+from tests.neurons import new_bytedna
+
+SELECTION_CRITERIA = [{"name": "x", "operator": "<", "value": 8}]
+
+def without_times(gens_stats : list):
+    """Returns the gens' stats without the measured times, which are different in every run."""
+    return [{key: value for key, value in gen_stats.items() if key not in ("phases", "memory_peaks")} for gen_stats in gens_stats]
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def open_lab(self, name : str):
+        with contextlib.redirect_stdout(io.StringIO()):
+            lab = Lab(new_bytedna(), SELECTION_CRITERIA, world_size=16, population=48, steps_per_gen=12, gens_per_save=4, checkpoint_interval=3,
+                      seed=5, name=name, path=self.path)
+        self.addCleanup(lab.archive.close)
+        return lab
+
+    def run_lab(self, lab : Lab, gens : int):
+        with contextlib.redirect_stdout(io.StringIO()):
+            while lab.gen + 1 < gens:
+                lab.run_generation()
+
+    def load_gens(self, lab : Lab):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return lab.load_gens()
+
+    def test_resume_is_identical(self):
+        # A lab that is stopped and resumed from its checkpoint continues bit for bit like a lab that runs without stopping.
+        continuous = self.open_lab("continuous")
+        self.run_lab(continuous, 12)
+        continuous_genomes, continuous_stats = self.load_gens(continuous)
+
+        resumed = self.open_lab("resumed")
+        self.run_lab(resumed, 7)
+        resumed = self.open_lab("resumed")
+        self.assertEqual(resumed.gen, 5) # The latest checkpoint is after gen 5, gen 6 is run again.
+        self.run_lab(resumed, 12)
+        resumed_genomes, resumed_stats = self.load_gens(resumed)
+
+        self.assertEqual(resumed_genomes, continuous_genomes)
+        self.assertEqual(without_times(resumed_stats), without_times(continuous_stats))
+        self.assertEqual(resumed.last_survived_genomes, continuous.last_survived_genomes)
+
+    def test_changed_files_skip_the_checkpoint(self):
+        # A half written stats line (a crash during a save) makes the checkpoint old: the lab continues from the saved gens instead.
+        lab = self.open_lab("crashed")
+        self.run_lab(lab, 7)
+        with open(os.path.join(lab.path, "stats.jsonl"), "a") as file:
+            file.write('{"survived": ')
+
+        lab = self.open_lab("crashed")
+        self.assertEqual(lab.gen, 3)
+        self.assertEqual(lab.archive.gen_count, 4)
+        self.assertEqual(len(lab.stats_log.read()), 4)
+
+    def test_stats_without_genomes_are_kept(self):
+        # An old save that has stats.json but no genomes keeps its stats, and they are moved aside when the first gens are saved.
+        lab = self.open_lab("stats_only")
+        lab.archive.close()
+        os.remove(os.path.join(lab.path, "genomes.bin"))
+        old_stats = [{"survived": i, "diversity": 0} for i in range(20)]
+        with open(os.path.join(lab.path, "stats.json"), "w") as file:
+            json.dump(old_stats, file)
+
+        lab = self.open_lab("stats_only")
+        self.assertEqual(lab.gen, -1)
+        self.assertEqual(lab.stats_log.read(), old_stats)
+        self.run_lab(lab, 3)
+
+        # The checkpoint after gen 2 continues the lab before the stats are moved aside.
+        lab = self.open_lab("stats_only")
+        self.assertEqual(lab.gen, 2)
+        self.assertEqual(lab.stats_log.read(), old_stats)
+        self.run_lab(lab, 4)
+        self.assertEqual(lab.archive.gen_count, 4)
+        self.assertEqual(len(lab.stats_log.read()), 4)
+        with open(os.path.join(lab.path, "stats.jsonl.old"), "r") as file:
+            self.assertEqual([json.loads(line) for line in file], old_stats)
+
+        lab = self.open_lab("stats_only")
+        self.assertEqual(lab.gen, 3)
+        self.assertEqual(len(lab.stats_log.read()), 4)
+
+    def test_random_states_are_restored(self):
+        # The global random generators continue from the checkpoint like they continue without stopping.
+        lab = self.open_lab("random_states")
+        self.run_lab(lab, 3)
+        np.random.normal() # Caches a gaussian into the state
+        random.gauss(0, 1)
+        lab.save_checkpoint()
+        expected = (np.random.random(5).tolist(), np.random.normal(), [random.random() for i in range(5)], random.gauss(0, 1))
+
+        np.random.seed(1)
+        random.seed(1)
+        lab = self.open_lab("random_states")
+        self.assertEqual((np.random.random(5).tolist(), np.random.normal(), [random.random() for i in range(5)], random.gauss(0, 1)), expected)
+
+    def test_checkpoint_is_not_unpickled(self):
+        # Checkpoints are JSON and raw bytes: a pickled file (like old checkpoints, or a harmful one in a shared save) isn't loaded.
+        filepath = os.path.join(self.path, "checkpoint.bin")
+        with open(filepath, "wb") as file:
+            pickle.dump({"version": 1, "gen": 3}, file)
+        self.assertIsNone(load_checkpoint(filepath))
+
+        save_checkpoint(filepath, {"gen": 3, "genomes": b"\x00\xff", "empty": b"", "none": None, "stats": [{"survived": 1.5}]})
+        self.assertEqual(load_checkpoint(filepath), {"gen": 3, "genomes": b"\x00\xff", "empty": b"", "none": None, "stats": [{"survived": 1.5}]})
+        with open(filepath, "r+b") as file:
+            file.truncate(os.path.getsize(filepath) - 1)
+        self.assertIsNone(load_checkpoint(filepath))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from tests.neurons import new_bytedna
+
+def loop_crossover(bytedna, genomes : bytearray, population : int, rng : np.random.Generator):
+    """
+    The crossover one couple and one pair of offsprings at a time (the original loop), with the same random draws as ByteDNA.crossover:
+    a permutation of the survivors, then every pair's crossover point.
+    """
+    genome_bytes = bytedna.genome_len * bytedna.gene_bytes
+    separated_genomes = [genomes[i : i + genome_bytes] for i in range(0, len(genomes), genome_bytes)]
+    separated_genomes = [separated_genomes[i] for i in rng.permutation(len(separated_genomes))]
+    survived = len(separated_genomes)
+    result_genomes = bytearray()
+
+    singles = survived % 2
+    if singles == 1:
+        result_genomes.extend(separated_genomes.pop())
+    parents_count = survived - singles
+    needed_children = population - singles
+    children_per_couple = (needed_children / parents_count) * 2
+    default_children_per_couple = int(np.floor(children_per_couple))
+    additional_childs = int(np.round((children_per_couple - default_children_per_couple) * (parents_count * 0.5)))
+
+    # Children counts per couple, then every pair's crossover point in order.
+    children_counts = []
+    for parent_i in range(0, parents_count, 2):
+        children_count = default_children_per_couple
+        if additional_childs > 0:
+            children_count += 1
+            additional_childs -= 1
+        children_counts.append(children_count)
+    crossover_points = iter(rng.integers(bytedna.genome_len, size=sum([(count + 1) // 2 for count in children_counts])).tolist())
+
+    for couple_i, children_count in enumerate(children_counts):
+        parent0 = separated_genomes[couple_i * 2]
+        parent1 = separated_genomes[couple_i * 2 + 1]
+        for child_i in range(0, children_count, 2):
+            crossover_point = next(crossover_points) * bytedna.gene_bytes
+            result_genomes.extend(parent0[:crossover_point] + parent1[crossover_point:])
+            if child_i + 1 < children_count:
+                result_genomes.extend(parent1[:crossover_point] + parent0[crossover_point:])
+
+    return result_genomes
+
+class CrossoverTest(unittest.TestCase):
+    def test_matches_loop_crossover(self):
+        # Same children (and so the same child counts) as the loop, for even and odd survivors, and more or fewer survivors than needed.
+        bytedna = new_bytedna(genome_len=6)
+        genome_bytes = bytedna.genome_len * bytedna.gene_bytes
+        for survived in [2, 3, 5, 17, 64, 127]:
+            for population in [16, 64, 100, 128]:
+                seed = survived * 1000 + population
+                genomes = new_bytedna(genome_len=6, seed=seed).random_genomes(survived)
+                bytedna.rng = np.random.default_rng(seed)
+                children = bytedna.crossover(genomes, population, mutate=False)
+                expected = loop_crossover(bytedna, genomes, population, np.random.default_rng(seed))
+                self.assertEqual(bytes(children), bytes(expected), f"survived {survived}, population {population}")
+                if survived <= population:
+                    self.assertEqual(len(children) // genome_bytes, population, f"survived {survived}, population {population}")
+
+    def test_needs_two_survivors(self):
+        bytedna = new_bytedna()
+        with self.assertRaises(ValueError):
+            bytedna.crossover(bytedna.random_genomes(1), 64)
+
+if __name__ == "__main__":
+    unittest.main()
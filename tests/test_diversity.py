@@ -0,0 +1,44 @@
+import unittest
+import tempfile
+import numpy as np
+from lab.lab import Lab
+from tests.neurons import new_bytedna
+
+def brute_force_hamming_distance(bytedna, genomes : bytearray, population : int):
+    """Average of the different bits over all pairs of different genomes, relative to the genome's bits (times 2, like ByteDNA)."""
+    genomes_list = bytedna.get_separated_genomes(genomes)[:population]
+    int_genomes = [int.from_bytes(genome) for genome in genomes_list]
+    distances = [(int_genomes[i] ^ int_genomes[j]).bit_count() for i in range(len(int_genomes)) for j in range(i + 1, len(int_genomes))]
+    return sum(distances) / len(distances) / (bytedna.gene_bits * bytedna.genome_len) * 2
+
+class DiversityTest(unittest.TestCase):
+    def setUp(self):
+        self.bytedna = new_bytedna(seed=4)
+        # Random genomes, and genomes that are mostly the same (a few mutated copies), so the distance isn't only about 1.0.
+        self.random_genomes = self.bytedna.random_genomes(40)
+        similar_genomes = bytearray(self.random_genomes[:len(self.random_genomes) // 40] * 40)
+        for i in range(0, len(similar_genomes), 7):
+            similar_genomes[i] ^= 1 << (i % 8)
+        self.similar_genomes = similar_genomes
+
+    def test_average_is_the_same_as_brute_force(self):
+        for genomes in (self.random_genomes, self.similar_genomes):
+            for population in (40, 17, 2):
+                self.assertAlmostEqual(self.bytedna.average_hamming_distance(genomes, population),
+                                       brute_force_hamming_distance(self.bytedna, genomes, population), places=12)
+        self.assertEqual(self.bytedna.average_hamming_distance(self.random_genomes, 1), 0.0)
+        self.assertEqual(self.bytedna.average_hamming_distance(self.random_genomes[:self.bytedna.genome_len * self.bytedna.gene_bytes] * 10, 10), 0.0)
+
+    def test_sampled_converges(self):
+        for genomes in (self.random_genomes, self.similar_genomes):
+            exact = self.bytedna.average_hamming_distance(genomes, 40)
+            self.assertAlmostEqual(self.bytedna.sampled_hamming_distance(genomes, 40, 200000), exact, delta=0.01 * exact)
+            self.assertEqual(self.bytedna.sampled_hamming_distance(genomes, 1, 100), 0.0)
+
+    def test_diversity_interval_is_validated(self):
+        with tempfile.TemporaryDirectory() as path:
+            with self.assertRaises(ValueError):
+                Lab(self.bytedna, [{"name": "x", "operator": "<", "value": 8}], diversity_interval=0, path=path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import numpy as np
+from lab.bytedna import batched
+from lab.generation import Generation
+from tests.neurons import new_bytedna, moveUP, moveDOWN, moveRIGHT, moveLEFT
+
+# Inputs that don't depend on the positions, so moving during Creature.update (old way) or after the step can be compared.
+@batched
+def idInput(activation : np.ndarray, data : dict, generation):
+    return (data["id"] % 7) / 6
+@batched
+def alwaysOn(activation : np.ndarray, data : dict, generation):
+    return np.ones(len(activation))
+
+# Old movement: the creature moves with change_pos right away, during its own update.
+def moveNow(x_change : int, y_change : int):
+    def move(activation : float, data : dict, generation):
+        if activation > 0 and generation.change_pos(data["x"], data["y"], x_change, y_change):
+            data["x"] += x_change
+            data["y"] += y_change
+        return 0
+    return move
+
+class MovesTest(unittest.TestCase):
+    def new_generation(self, seed : int, population : int = 64, world_size : int = 12, move_order : str = "sequential"):
+        generation = Generation(bytearray(), new_bytedna(), world_size, population, 1, move_order, np.random.default_rng(seed))
+        generation.spawn_population(population)
+        return generation
+
+    def queue_random_rounds(self, generation : Generation, rng : np.random.Generator, rounds : int = 4):
+        for i in range(rounds):
+            ids = rng.choice(len(generation.x), size=rng.integers(1, len(generation.x)), replace=False)
+            changes = rng.integers(-1, 2, size=(2, len(ids)))
+            generation.queue_moves(ids, changes[0], changes[1])
+
+    def test_sequential_matches_change_pos(self):
+        # Sequential resolve = change_pos one creature at a time, every creature's moves in queue order.
+        for seed in range(20):
+            generation = self.new_generation(seed)
+            rng = np.random.default_rng(seed)
+            self.queue_random_rounds(generation, rng)
+
+            expected = self.new_generation(seed)
+            moves = sorted([(creature_i, round_i, x_change, y_change) for round_i, (ids, x_changes, y_changes) in enumerate(generation.moves_queue)
+                            for creature_i, x_change, y_change in zip(ids.tolist(), x_changes.tolist(), y_changes.tolist())])
+            for creature_i, round_i, x_change, y_change in moves:
+                x, y = int(expected.x[creature_i]), int(expected.y[creature_i])
+                if expected.change_pos(x, y, x_change, y_change):
+                    expected.x[creature_i], expected.y[creature_i] = x + x_change, y + y_change
+
+            generation.resolve_moves()
+            np.testing.assert_array_equal(generation.x, expected.x)
+            np.testing.assert_array_equal(generation.y, expected.y)
+            np.testing.assert_array_equal(generation.map, expected.map)
+
+    def test_bulk_keeps_map_consistent(self):
+        # Bulk resolve: no creature leaves the map or shares a cell, and the map has every creature's index at its position.
+        for seed in range(20):
+            generation = self.new_generation(seed, move_order="bulk")
+            self.queue_random_rounds(generation, np.random.default_rng(seed))
+            generation.resolve_moves()
+
+            self.assertTrue(np.all((generation.x >= 0) & (generation.x < generation.world_size) & (generation.y >= 0) & (generation.y < generation.world_size)))
+            np.testing.assert_array_equal(generation.map[generation.x, generation.y], np.arange(1, len(generation.x) + 1))
+            self.assertEqual(np.count_nonzero(generation.map), len(generation.x))
+
+    def test_queued_generation_matches_old_movement(self):
+        # A whole generation with queued sequential moves = the same generation with the old immediate change_pos moves.
+        inputs = [idInput, alwaysOn]
+        queued_bytedna = new_bytedna(inputs, [moveUP, moveDOWN, moveRIGHT, moveLEFT])
+        old_bytedna = new_bytedna(inputs, [moveNow(0, -1), moveNow(0, 1), moveNow(1, 0), moveNow(-1, 0)])
+        for seed in range(4):
+            genomes = queued_bytedna.random_genomes(64)
+            queued = Generation(genomes, queued_bytedna, 12, 64, 24, "sequential", np.random.default_rng(seed))
+            old = Generation(genomes, old_bytedna, 12, 64, 24, "sequential", np.random.default_rng(seed))
+            queued.run(save_steps=True)
+            old.run(save_steps=True, population_brain=False)
+            for step in range(len(queued.steps_data)):
+                np.testing.assert_array_equal(queued.steps_data.get_positions(step), old.steps_data.get_positions(step))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import io
+import json
+import unittest
+import tempfile
+import contextlib
+from lab.lab import Lab
+from tests.neurons import new_bytedna
+
+SELECTION_CRITERIA = [{"name": "x", "operator": "<", "value": 8}]
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_lab(self, gens : int, name : str = "default", **kwargs):
+        # gens_per_save=4 leaves the latest gens unsaved, so replays read both saved and unsaved gens.
+        with contextlib.redirect_stdout(io.StringIO()):
+            lab = Lab(new_bytedna(), SELECTION_CRITERIA, world_size=16, population=48, steps_per_gen=12, gens_per_save=4, seed=11,
+                      record_gens=1, name=name, path=self.path, **kwargs)
+            self.addCleanup(lab.archive.close)
+            while lab.gen + 1 < gens:
+                lab.run_generation()
+        return lab
+
+    def assert_replays_are_exact(self, lab : Lab):
+        for gen in range(lab.gen + 1):
+            recording = lab.load_recording(gen)
+            replay = lab.replay_generation(gen)
+            self.assertEqual(replay.steps_count, recording.steps_count)
+            for step in range(recording.steps_count):
+                self.assertEqual(replay.get_positions(step).tolist(), recording.get_positions(step).tolist(), f"gen {gen}, step {step}")
+
+    def test_replay_is_exact(self):
+        # Replaying a gen from its genomes and seed gives the same positions on every step as the recorded run.
+        self.assert_replays_are_exact(self.run_lab(6))
+
+    def test_replay_is_exact_with_bulk_moves(self):
+        self.assert_replays_are_exact(self.run_lab(6, move_order="bulk", spawn_region=(0, 0, 12, 16), spawn_density=0.5))
+
+    def test_gens_without_seed_raise(self):
+        lab = self.run_lab(6)
+        self.assertEqual(lab.archive.gen_count, 4)
+
+        # An unsaved gen without a seed
+        del lab.unsaved_gens_stats[-1]["seed"]
+        with self.assertRaises(ValueError):
+            lab.get_replay_seed(5)
+        with self.assertRaises(ValueError):
+            lab.replay_generation(5)
+
+        # A saved gen without a seed (like gens from before seeds were saved)
+        stats_filepath = os.path.join(lab.path, "stats.jsonl")
+        with open(stats_filepath, "r") as file:
+            gens_stats = [json.loads(line) for line in file]
+        gens_stats[1]["seed"] = None
+        with open(stats_filepath, "w") as file:
+            file.write("".join([json.dumps(gen_stats) + "\n" for gen_stats in gens_stats]))
+        with self.assertRaises(ValueError):
+            lab.get_replay_seed(1)
+        self.assertEqual(lab.get_replay_seed(2), lab.get_gen_seed(2))
+
+        # The lab's seed has changed, so the saved seeds aren't the lab's seeds.
+        lab.seed += 1
+        with self.assertRaises(ValueError):
+            lab.get_replay_seed(2)
+
+if __name__ == "__main__":
+    unittest.main()
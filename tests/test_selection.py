@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+from lab.generation import Generation
+from lab.selection import Selection
+from tests.neurons import new_bytedna
+
+def old_selection_indices(generation : Generation, selection_criteria : list):
+    """The selection before Selection: a loop over the creatures and the criteria of every name (all have to match)."""
+    indices = []
+    criteria_names = []
+    for criterion in selection_criteria:
+        if not criterion["name"] in criteria_names: criteria_names.append(criterion["name"])
+
+    for i, creature in enumerate(generation.creatures):
+        data = creature.data
+        survives = True
+        for name in criteria_names:
+            for criterion in [criterion for criterion in selection_criteria if criterion["name"] == name]:
+                operator = criterion["operator"]
+                value = criterion["value"]
+                if operator == "=":
+                    if data[name] != value: survives = False
+                elif operator == "<":
+                    if data[name] >= value: survives = False
+                elif operator == ">":
+                    if data[name] <= value: survives = False
+            if survives == False: break
+        if survives == True:
+            indices.append(i)
+    return indices
+
+class SelectionTest(unittest.TestCase):
+    def setUp(self):
+        self.bytedna = new_bytedna()
+        self.generation = Generation(self.bytedna.random_genomes(150), self.bytedna, 16, 150, 8, rng=np.random.default_rng(3))
+        self.generation.run()
+        for i, creature in enumerate(self.generation.creatures):
+            creature.data["energy"] = i % 7
+        self.x = self.generation.x
+        self.y = self.generation.y
+
+    def get_indices(self, criteria):
+        return Selection(criteria).get_indices(self.generation).tolist()
+
+    def assert_selects(self, criteria, mask : np.ndarray):
+        self.assertEqual(self.get_indices(criteria), np.flatnonzero(mask).tolist())
+
+    def test_same_as_old_selection(self):
+        criteria_lists = [
+            [{"name": "x", "operator": "<", "value": 8}],
+            [{"name": "x", "operator": ">", "value": 3}, {"name": "y", "operator": "<", "value": 12}],
+            [{"name": "x", "operator": ">", "value": 2}, {"name": "x", "operator": "<", "value": 10}, {"name": "y", "operator": "=", "value": 5}],
+            [{"name": "energy", "operator": "=", "value": 3}],
+            [{"name": "energy", "operator": ">", "value": 1}, {"name": "x", "operator": "<", "value": 9}, {"name": "energy", "operator": "<", "value": 6}],
+            [{"name": "x", "operator": "<", "value": 0}],
+            []
+        ]
+        for criteria in criteria_lists:
+            old_indices = old_selection_indices(self.generation, criteria)
+            self.assertEqual(self.get_indices(criteria), old_indices, criteria)
+            self.assertEqual(self.generation.get_selection_indices(Selection(criteria)).tolist(), old_indices, criteria)
+
+    def test_zones(self):
+        self.assert_selects([{"name": "energy", "operator": "range", "value": (2, 5)}],
+                            (np.arange(150) % 7 >= 2) & (np.arange(150) % 7 < 5))
+        self.assert_selects([{"operator": "rect", "value": (2, 4, 10, 9)}],
+                            (self.x >= 2) & (self.x < 10) & (self.y >= 4) & (self.y < 9))
+        self.assert_selects([{"operator": "circle", "value": (8, 6, 4.5)}],
+                            (self.x - 8) ** 2 + (self.y - 6) ** 2 <= 4.5 ** 2)
+        self.assert_selects({"operator": "circle", "value": (0, 0, 3)}, self.x ** 2 + self.y ** 2 <= 9)
+
+    def test_nested_criteria(self):
+        left = self.x < 4
+        right = self.x >= 12
+        center = (self.x - 8) ** 2 + (self.y - 8) ** 2 <= 9
+        even_energy = np.arange(150) % 7 % 2 == 0
+
+        self.assert_selects({"any": [{"name": "x", "operator": "<", "value": 4}, {"operator": "rect", "value": (12, 0, 16, 16)}]}, left | right)
+        self.assert_selects([{"any": [{"name": "x", "operator": "<", "value": 4}, {"operator": "circle", "value": (8, 8, 3)}]},
+                             {"any": [{"name": "energy", "operator": "=", "value": value} for value in (0, 2, 4, 6)]}],
+                            (left | center) & even_energy)
+        self.assert_selects({"all": [{"any": [{"all": [{"name": "x", "operator": ">", "value": 11}]}, {"name": "y", "operator": "<", "value": 2}]},
+                                     {"name": "energy", "operator": "range", "value": (0, 4)}]},
+                            (right | (self.y < 2)) & (np.arange(150) % 7 < 4))
+        self.assert_selects({"any": []}, np.zeros(150, dtype=bool))
+        self.assert_selects({"all": []}, np.ones(150, dtype=bool))
+
+    def test_invalid_criteria(self):
+        with self.assertRaises(ValueError):
+            Selection([{"name": "x", "operator": "<=", "value": 3}])
+        with self.assertRaises(ValueError):
+            Selection([{"operator": "<", "value": 3}])
+
+    def test_selection_genomes(self):
+        criteria = [{"name": "energy", "operator": "<", "value": 3}, {"operator": "rect", "value": (0, 0, 12, 16)}]
+        indices = self.get_indices(criteria)
+        genomes_list = self.bytedna.get_separated_genomes(self.generation.genomes)
+        self.assertEqual(self.generation.get_selection_genomes(criteria), b"".join([bytes(genomes_list[i]) for i in indices]))
+
+if __name__ == "__main__":
+    unittest.main()